@@ -0,0 +1,54 @@
+import json
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+# Dokumentasi API dilayani dari skema statis hasil `manage.py build_api_schema`.
+# drf_yasg hanya dipakai saat build; worker cukup membaca file JSON dan
+# memakai template + static Swagger UI / ReDoc bawaan drf_yasg.
+
+API_TITLE = "API Laris Amanah"
+API_VERSION = 'v1'
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title=API_TITLE,
+        default_version=API_VERSION,
+        description="Dokumentasi API.",
+        contact=openapi.Contact(email="larisamanah@basisdata.com"),
+        license=openapi.License(name="bapakkuprogrammer"),
+    )
+
+
+def openapi_schema(request):
+    try:
+        schema_file = open(settings.API_SCHEMA_FILE, 'rb')
+    except FileNotFoundError:
+        raise Http404("API schema has not been generated. Run `manage.py build_api_schema`.")
+    response = FileResponse(schema_file, content_type='application/json')
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_CACHE_SECONDS)
+    return response
+
+
+def swagger_ui(request):
+    return render(request, 'drf-yasg/swagger-ui.html', {
+        'title': API_TITLE,
+        'version': API_VERSION,
+        'swagger_settings': json.dumps({'url': reverse('schema-json'), 'deepLinking': True}),
+        'oauth2_config': json.dumps({}),
+        'USE_SESSION_AUTH': False,
+    })
+
+
+def redoc_ui(request):
+    return render(request, 'drf-yasg/redoc.html', {
+        'title': API_TITLE,
+        'version': API_VERSION,
+        'redoc_settings': json.dumps({'url': reverse('schema-json')}),
+    })
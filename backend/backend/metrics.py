@@ -0,0 +1,335 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+
+# Metrik operasional dalam format teks Prometheus, dibaca lewat GET /metrics.
+#
+# Setiap proses menyimpan metriknya di memori. Jika settings.METRICS_DIR diisi,
+# setiap proses juga menulis salinannya ke METRICS_DIR/metrics-<pid>.json
+# (paling sering sekali per METRICS_FLUSH_SECONDS), dan /metrics menjumlahkan
+# semua file tersebut, sehingga worker mana pun yang menjawab scrape memberi
+# angka untuk seluruh deployment.
+#
+# Saat pertama kali menulis, sebuah proses memindahkan file milik proses yang
+# sudah mati (termasuk file lama dengan pid yang sama dengan pid-nya sendiri)
+# ke METRICS_DIR/metrics-archive.json lalu menghapusnya. Total counter tidak
+# pernah turun karena worker diganti, dan jumlah file tetap sebanyak worker
+# yang hidup. Kosongkan METRICS_DIR saat seluruh deployment dijalankan ulang.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOCK_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+ARCHIVE_FILE = 'metrics-archive.json'
+
+
+class Metric:
+    """
+    A counter or histogram with labels. Values are kept per label tuple:
+    a float for counters, [bucket counts..., sum, count] for histograms.
+    """
+
+    def __init__(self, registry, name, help_text, kind, labelnames, buckets=None):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.registry.lock:
+            slots = self.values.get(key)
+            if slots is None:
+                slots = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    slots[i] += 1
+            slots[-2] += value
+            slots[-1] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._last_flush = 0.0
+        self._pid = None
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Metric(self, name, help_text, 'counter', labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Metric(self, name, help_text, 'histogram', labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(key), value if metric.kind == 'counter' else list(value)]
+                       for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Writes this process's values to METRICS_DIR, atomically."""
+        self._last_flush = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.archive_dead_processes()
+        _write_snapshot(f'metrics-{os.getpid()}.json', self.snapshot())
+
+    def archive_dead_processes(self):
+        """
+        Adds the files of processes that are gone to ARCHIVE_FILE and removes
+        them. A file under this process's pid was left by an earlier process
+        that had the same pid, so it counts as dead too.
+        """
+        with _dir_lock(exclusive=True):
+            dead = []
+            for file_name in os.listdir(settings.METRICS_DIR):
+                pid = _file_pid(file_name)
+                if pid is not None and (pid == os.getpid() or not _alive(pid)):
+                    dead.append(file_name)
+            if not dead:
+                return
+            snapshots = [_read_snapshot(file_name) for file_name in [ARCHIVE_FILE, *dead]]
+            merged = _merge(snapshot for snapshot in snapshots if snapshot is not None)
+            _write_snapshot(ARCHIVE_FILE, {
+                name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()
+            })
+            for file_name in dead:
+                os.remove(os.path.join(settings.METRICS_DIR, file_name))
+
+    def collect(self):
+        """
+        Sums the values of every process that wrote to METRICS_DIR, and of
+        the archived dead ones (this one's live values instead of its file).
+        Returns {name: {key: value}}.
+        """
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+            own_file = f'metrics-{os.getpid()}.json'
+            # Shared with other scrapes, so an archive run is never seen half done.
+            with _dir_lock(exclusive=False):
+                for file_name in os.listdir(settings.METRICS_DIR):
+                    if not file_name.startswith('metrics-') or file_name == own_file:
+                        continue
+                    snapshot = _read_snapshot(file_name)
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+
+        merged = _merge(snapshots)
+        return {name: merged.get(name, {}) for name in self.metrics}
+
+    def render(self):
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.help_text}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key in sorted(values):
+                labels = dict(zip(metric.labelnames, key))
+                if metric.kind == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {_number(values[key])}')
+                    continue
+                slots = values[key]
+                for bound, count in zip(metric.buckets, slots):
+                    lines.append(f'{name}_bucket{_labels(dict(labels, le=_number(bound)))} {_number(count)}')
+                lines.append(f'{name}_bucket{_labels(dict(labels, le="+Inf"))} {_number(slots[-1])}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(slots[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {_number(slots[-1])}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, entries in snapshot.items():
+            values = merged.setdefault(name, {})
+            for key, value in entries:
+                key = tuple(key)
+                current = values.get(key)
+                if current is None:
+                    values[key] = value
+                elif isinstance(value, list):
+                    values[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = current + value
+    return merged
+
+
+def _read_snapshot(file_name):
+    try:
+        with open(os.path.join(settings.METRICS_DIR, file_name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None  # Being replaced right now; next scrape picks it up
+
+
+def _write_snapshot(file_name, snapshot):
+    fd, tmp_path = tempfile.mkstemp(dir=settings.METRICS_DIR, prefix='.metrics-')
+    with os.fdopen(fd, 'w') as handle:
+        json.dump(snapshot, handle)
+    os.replace(tmp_path, os.path.join(settings.METRICS_DIR, file_name))
+
+
+@contextmanager
+def _dir_lock(exclusive):
+    import fcntl  # POSIX only, like the per-process files in a shared directory
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _file_pid(file_name):
+    """The pid in metrics-<pid>.json, or None for any other file."""
+    if file_name.startswith('metrics-') and file_name.endswith('.json') and file_name[8:-5].isdigit():
+        return int(file_name[8:-5])
+    return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, under another user
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    'http_request_duration_seconds', "Request latency by view.", ('view', 'method', 'status'),
+)
+db_queries = registry.counter(
+    'db_queries_total', "Database queries run while serving requests, by view.", ('view',),
+)
+db_query_time = registry.counter(
+    'db_query_duration_seconds_total', "Time spent in database queries while serving requests, by view.", ('view',),
+)
+stock_lock_wait = registry.histogram(
+    'stock_lock_wait_seconds', "Time a checkout spent locking and decrementing its stock row.", ('stock',),
+    buckets=LOCK_WAIT_BUCKETS,
+)
+write_lock_wait = registry.histogram(
+    'db_write_lock_wait_seconds', "Time a write transaction waited at BEGIN for the database write lock (SQLite).",
+    buckets=LOCK_WAIT_BUCKETS,
+)
+checkout_failures = registry.counter(
+    'checkout_failures_total', "Failed POST /api/transaksi/ requests by reason.", ('reason',),
+)
+cache_requests = registry.counter(
+    'cache_requests_total', "Cache lookups by cache and result (hit or miss).", ('cache', 'result'),
+)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    return view_class.__name__ if view_class is not None else match.func.__name__
+
+
+def checkout_failure_reason(exc):
+    """out_of_stock, lock_timeout or validation, for checkout_failures."""
+    error = exc
+    while error is not None:
+        if isinstance(error, OperationalError):
+            return 'lock_timeout'
+        error = error.__cause__ or error.__context__
+    if isinstance(exc, ValidationError) and 'out_of_stock' in _flatten(exc.get_codes()):
+        return 'out_of_stock'
+    return 'validation'
+
+
+def _flatten(codes):
+    if isinstance(codes, dict):
+        return [code for value in codes.values() for code in _flatten(value)]
+    if isinstance(codes, list):
+        return [code for value in codes for code in _flatten(value)]
+    return [codes]
+
+
+class MetricsMiddleware:
+    """
+    Times every request and counts the queries it runs on the default
+    database, labelled with the view class that served it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = view_name(request)
+        request_latency.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        if queries[0]:
+            db_queries.inc(queries[0], view=view)
+            db_query_time.inc(queries[1], view=view)
+        registry.maybe_flush()
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
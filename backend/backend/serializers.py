@@ -0,0 +1,78 @@
+from rest_framework import serializers
+
+# Validasi payload list (many=True) dengan sedikit query: semua data yang
+# dirujuk payload diambil sekali di awal, lalu tiap item divalidasi dari memori.
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that validates a whole list payload against data loaded
+    up front instead of querying once per item.
+
+    prefetch(data) runs once per payload and returns a dict that the child
+    serializer sees as `self.prefetched` (PrefetchedSlugRelatedField looks its
+    objects up there). validate_item(attrs) then runs, in payload order, for
+    every item that passed the child's own validation. Errors stay per item,
+    exactly as with a plain ListSerializer.
+    """
+
+    def prefetch(self, data):
+        return {}
+
+    def validate_item(self, attrs):
+        return attrs
+
+    def collect(self, data, key):
+        """Every string value of `key` in the payload, as sent and stripped."""
+        values = set()
+        for item in data:
+            value = item.get(key) if isinstance(item, dict) else None
+            if isinstance(value, str):
+                values.update((value, value.strip()))
+        return values
+
+    def partition(self, data):
+        """
+        Validates a list like is_valid() would, but keeps the items that pass
+        when others fail. Returns ([(index, attrs)...], {index: errors}).
+        """
+        self.child.prefetched = self.prefetch(data)
+        valid, errors = [], {}
+        try:
+            for index, item in enumerate(data):
+                try:
+                    valid.append((index, self.run_child_validation(item)))
+                except serializers.ValidationError as exc:
+                    errors[index] = exc.detail
+        finally:
+            self.child.prefetched = {}
+        return valid, errors
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        self.child.prefetched = self.prefetch(data)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.child.prefetched = {}
+
+    def run_child_validation(self, data):
+        return self.validate_item(super().run_child_validation(data))
+
+
+class PrefetchedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    SlugRelatedField that resolves the slug from the parent serializer's
+    `prefetched[field_name]` map when a BulkListSerializer filled it, and
+    falls back to the usual query otherwise.
+    """
+
+    def to_internal_value(self, data):
+        lookup = getattr(self.parent, 'prefetched', {}).get(self.field_name)
+        if lookup is None or not isinstance(data, str):
+            return super().to_internal_value(data)
+        obj = lookup.get(data)
+        if obj is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return obj
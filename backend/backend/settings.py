@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
 
+from corsheaders.defaults import default_headers
+
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", "dummy-secret-key-for-dev")
 
 # === BASE SETTINGS ===
@@ -22,6 +24,24 @@ DATABASES = {
     }
 }
 
+# === SQLITE ===
+# Diterapkan pada setiap koneksi SQLite baru oleh backend.sqlite. busy_timeout
+# dipasang lebih dulu supaya peralihan ke WAL ikut menunggu lock. WAL bersifat
+# permanen di file database; mematikan profil tidak mengembalikan journal_mode.
+SQLITE_PROFILE_ENABLED = os.environ.get('SQLITE_PROFILE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+SQLITE_PROFILE = {
+    'PRAGMAS': {
+        'busy_timeout': 5000,               # Milidetik menunggu lock sebelum "database is locked"
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',            # Aman dengan WAL; fsync hanya saat checkpoint
+        'mmap_size': 256 * 1024 * 1024,     # Byte
+        'cache_size': -64000,               # Negatif = KiB per koneksi
+        'temp_store': 'MEMORY',
+    },
+    # Mode BEGIN untuk blok backend.sqlite.write_atomic() (yang menulis)
+    'TRANSACTION_MODE': 'IMMEDIATE',
+}
+
 # === INSTALLED APPS ===
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -36,12 +56,23 @@ INSTALLED_APPS = [
     # Your apps
     'produk',
     'user',
-    # Documentation
-    'drf_yasg',
 ]
 
+# === DOCUMENTATION ===
+# Set API_DOCS_ENABLED=0 for API-only deployments: drf_yasg is then neither
+# installed nor imported. The schema itself is built once with
+# `manage.py build_api_schema` and served from API_SCHEMA_FILE.
+API_DOCS_ENABLED = os.environ.get('API_DOCS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+API_SCHEMA_FILE = BASE_DIR / 'openapi.json'
+API_SCHEMA_CACHE_SECONDS = 3600
+
+if API_DOCS_ENABLED:
+    INSTALLED_APPS.append('drf_yasg')  # Templates + static Swagger UI / ReDoc
+
 # === MIDDLEWARE ===
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
+    'backend.throttling.LoadMonitorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware', 
     'corsheaders.middleware.CorsMiddleware', 
@@ -104,6 +135,79 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True  # Development only
+# Update produk bersyarat: klien membaca ETag dan mengirim If-Match
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match')
+CORS_EXPOSE_HEADERS = ['ETag']
+
+# === CACHE ===
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PRODUK_CATALOG_CACHE_TIMEOUT = 60  # Detik; dipakai oleh produk.catalog
+
+# Snapshot katalog bersama (produk.shared_catalog): semua worker membaca harga,
+# nama dan petunjuk stok dari satu file memory-mapped tanpa query. Hanya POSIX.
+PRODUK_SHARED_CATALOG = os.environ.get('PRODUK_SHARED_CATALOG', '0').lower() in ('1', 'true', 'yes')
+PRODUK_SHARED_CATALOG_PATH = os.environ.get('PRODUK_SHARED_CATALOG_PATH', str(BASE_DIR / 'produk-catalog.bin'))
+PRODUK_SHARED_CATALOG_MAX_AGE = 300  # Detik; setelah ini dibangun ulang penuh di latar belakang
+PRODUK_SHARED_CATALOG_PATCH_INTERVAL_MS = 200  # Perubahan stok saja dikumpulkan lalu di-patch sekaligus
+
+# Jumlah id_transaksi yang dipesan sekaligus per worker (produk.sequences)
+TRANSAKSI_ID_BLOCK_SIZE = 100
+
+# Group commit: checkout tunggal yang datang dalam jendela ini digabung ke satu
+# transaksi database (produk.group_commit). Menambah latensi hingga sebesar
+# jendela, tetapi jauh mengurangi jumlah commit di SQLite.
+CHECKOUT_GROUP_COMMIT = os.environ.get('CHECKOUT_GROUP_COMMIT', '0').lower() in ('1', 'true', 'yes')
+CHECKOUT_GROUP_COMMIT_WINDOW_MS = 3
+CHECKOUT_GROUP_COMMIT_MAX_BATCH = 64
+CHECKOUT_GROUP_COMMIT_TIMEOUT_SECONDS = 30  # Batas tunggu request sebelum 503
+
+# Default untuk GET /api/produk/low-stock/
+LOW_STOCK_THRESHOLD = 10
+LOW_STOCK_WINDOW_DAYS = 30
+
+# GET /api/produk/changes/: perubahan yang lebih muda dari ini ditahan dulu
+# supaya transaksi yang belum commit tidak terlewat oleh watermark klien.
+PRODUK_SYNC_LAG_SECONDS = 2
+PRODUK_SYNC_PAGE_SIZE = 500
+PRODUK_SYNC_MAX_PAGE_SIZE = 5000
+
+# Jumlah maksimum sub-request dalam satu POST /api/batch/
+BATCH_MAX_REQUESTS = 50
+
+# === METRICS ===
+# GET /metrics dalam format Prometheus (backend.metrics). Dengan beberapa worker,
+# isi METRICS_DIR dengan direktori bersama agar angkanya dijumlahkan antar proses.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = 1
+
+# === THROTTLING ===
+# Token bucket per token (atau per IP untuk anonim) dan per kelas endpoint,
+# lihat backend.throttling. 'rate' = token per detik, 'burst' = kapasitas bucket.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+THROTTLE_STORAGE = os.environ.get('THROTTLE_STORAGE', 'memory')  # 'memory' atau 'cache' (dibagi antar worker)
+THROTTLE_BUCKETS = {
+    'read': {'rate': 20, 'burst': 60},
+    'write': {'rate': 5, 'burst': 20},
+    'checkout': {'rate': 10, 'burst': 30},
+    'report': {'rate': 0.5, 'burst': 5},
+    'bulk': {'rate': 0.5, 'burst': 5},
+}
+
+# Saat worker kewalahan, scope di bawah ini ditolak dengan 503 + Retry-After
+# supaya checkout dan bacaan ringan tetap cepat.
+LOAD_SHEDDING = {
+    'SCOPES': ['report', 'bulk'],
+    'MAX_IN_FLIGHT': 16,          # Request yang sedang berjalan di proses ini
+    'MAX_LATENCY_MS': 1000,       # Rata-rata bergerak latensi request
+    'STALE_AFTER_SECONDS': 5,
+    'RETRY_AFTER_SECONDS': 5,
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -111,5 +215,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'backend.throttling.TokenBucketThrottle',
+    ],
 }
\ No newline at end of file
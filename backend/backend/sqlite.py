@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal
+
+# Profil performa SQLite yang diterapkan pada setiap koneksi baru (lihat
+# settings.SQLITE_PROFILE). Dengan WAL, pembaca tidak lagi memblokir penulis
+# dan sebaliknya. Blok yang menulis memakai write_atomic(): transaksinya
+# dibuka dengan BEGIN IMMEDIATE, sehingga dua penulis antre lewat busy_timeout
+# alih-alih gagal dengan "database is locked" saat read lock dinaikkan ke
+# write lock. Blok transaction.atomic() biasa (hanya membaca) tetap BEGIN
+# biasa dan berjalan bersamaan dengan penulis.
+
+# Sent after write_atomic() has opened its transaction with the write lock
+# held. Arguments: using (database alias) and wait (seconds spent in BEGIN).
+write_lock_acquired = Signal()
+
+
+def profile_pragmas(connection):
+    """
+    The PRAGMA statements the profile applies to `connection`, in order.
+    journal_mode is skipped for in-memory databases (test runs), which
+    cannot use WAL.
+    """
+    statements = []
+    for name, value in settings.SQLITE_PROFILE['PRAGMAS'].items():
+        if name == 'journal_mode' and connection.is_in_memory_db():
+            continue
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+def apply_profile(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PROFILE_ENABLED:
+        return
+    with connection.cursor() as cursor:
+        for statement in profile_pragmas(connection):
+            cursor.execute(statement)
+
+
+connection_created.connect(apply_profile, dispatch_uid='backend.sqlite.apply_profile')
+
+
+@contextmanager
+def write_atomic(using=None):
+    """
+    transaction.atomic() for a block that writes. On SQLite with the profile
+    on, the outermost block begins with settings.SQLITE_PROFILE's
+    TRANSACTION_MODE (IMMEDIATE), so it waits for the write lock as it opens
+    and write_lock_acquired reports how long. Nested blocks, other databases
+    and an explicit OPTIONS['transaction_mode'] get a plain atomic().
+    """
+    connection = transaction.get_connection(using)
+    mode = None
+    if connection.vendor == 'sqlite' and settings.SQLITE_PROFILE_ENABLED and not connection.in_atomic_block:
+        # Connecting resets transaction_mode from OPTIONS, so connect first.
+        connection.ensure_connection()
+        if connection.transaction_mode is None:
+            mode = settings.SQLITE_PROFILE['TRANSACTION_MODE']
+    if mode is None:
+        with transaction.atomic(using):
+            yield
+        return
+
+    started = time.perf_counter()
+    connection.transaction_mode = mode
+    try:
+        with transaction.atomic(using):
+            connection.transaction_mode = None
+            write_lock_acquired.send(sender=write_atomic, using=connection.alias, wait=time.perf_counter() - started)
+            yield
+    finally:
+        connection.transaction_mode = None
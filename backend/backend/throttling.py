@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+# Pembatasan laju per token (atau per IP untuk anonim) dan per kelas endpoint,
+# plus load shedding untuk endpoint mahal saat worker kewalahan.
+#
+# Kelas endpoint ("scope") diambil dari view:
+#   throttle_scopes = {'<action>': '<scope>'}  untuk viewset
+#   throttle_scope = '<scope>'                 untuk view biasa
+# dan jika tidak ada, 'read' untuk GET/HEAD/OPTIONS dan 'write' untuk lainnya.
+# Konfigurasi ada di settings.THROTTLE_BUCKETS dan settings.LOAD_SHEDDING.
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server sedang sibuk, coba lagi nanti."
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait  # DRF turns this into a Retry-After header
+
+
+class LoadMonitor:
+    """
+    Per-process view of how busy this worker is: requests in flight and an
+    exponentially weighted moving average of request latency. Fed by
+    LoadMonitorMiddleware.
+    """
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.last_sample = 0.0
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, elapsed):
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_ewma += self.alpha * (elapsed - self.latency_ewma)
+            self.last_sample = time.monotonic()
+
+    def overloaded(self):
+        config = settings.LOAD_SHEDDING
+        if self.in_flight > config['MAX_IN_FLIGHT']:
+            return True
+        # A stale average says nothing about now (e.g. everything was shed).
+        if time.monotonic() - self.last_sample > config['STALE_AFTER_SECONDS']:
+            return False
+        return self.latency_ewma * 1000 > config['MAX_LATENCY_MS']
+
+
+load_monitor = LoadMonitor()
+
+
+class LoadMonitorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        load_monitor.started()
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            load_monitor.finished(time.perf_counter() - started)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets kept in this process. Once the store grows past max_size,
+    buckets that would be full again (each by its own rate and burst) are
+    dropped, at most once every prune_interval seconds.
+    """
+
+    def __init__(self, max_size=10000, prune_interval=10):
+        self.max_size = max_size
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._pruned_at = float('-inf')
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, burst / rate)
+            if len(self._buckets) > self.max_size and now - self._pruned_at >= self.prune_interval:
+                self._prune(now)
+        return allowed, tokens
+
+    def _prune(self, now):
+        self._pruned_at = now
+        self._buckets = {
+            key: (tokens, updated, refill_time)
+            for key, (tokens, updated, refill_time) in self._buckets.items()
+            if now - updated < refill_time
+        }
+
+
+class CacheBucketStore:
+    """
+    Token buckets in the Django cache, shared by every worker using the same
+    cache backend. Updates are read-then-write, so concurrent workers can
+    occasionally let a request or two more through than the bucket holds.
+    """
+
+    prefix = 'throttle:bucket:'
+
+    def take(self, key, rate, burst, now):
+        cache_key = self.prefix + key
+        tokens, updated = cache.get(cache_key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(cache_key, (tokens, now), timeout=math.ceil(burst / rate) + 1)
+        return allowed, tokens
+
+
+_stores = {
+    'memory': MemoryBucketStore(),
+    'cache': CacheBucketStore(),
+}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Refills THROTTLE_BUCKETS[scope]['rate'] tokens per second up to 'burst'.
+    Each request takes one token from the bucket of its (scope, token) pair.
+    Scopes listed in LOAD_SHEDDING['SCOPES'] are refused with 503 while this
+    worker is overloaded, so cheap reads and checkouts keep their capacity.
+    """
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        scope = self.get_scope(request, view)
+        if scope in settings.LOAD_SHEDDING['SCOPES'] and load_monitor.overloaded():
+            raise ServiceOverloaded(wait=settings.LOAD_SHEDDING['RETRY_AFTER_SECONDS'])
+
+        bucket = settings.THROTTLE_BUCKETS.get(scope)
+        if bucket is None:
+            return True
+
+        self.rate = bucket['rate']
+        store = _stores[settings.THROTTLE_STORAGE]
+        allowed, self.tokens = store.take(
+            f"{scope}:{self.get_client_key(request)}",
+            bucket['rate'],
+            bucket['burst'],
+            time.monotonic() if settings.THROTTLE_STORAGE == 'memory' else time.time(),
+        )
+        return allowed
+
+    def wait(self):
+        # Seconds until the bucket holds a whole token again.
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def get_scope(self, request, view):
+        action = getattr(view, 'action', None)
+        scopes = getattr(view, 'throttle_scopes', {})
+        if action in scopes:
+            return scopes[action]
+        if getattr(view, 'throttle_scope', None):
+            return view.throttle_scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_client_key(self, request):
+        if request.auth is not None:
+            return f"token:{request.auth}"
+        return f"ip:{self.get_ident(request)}"
@@ -1,30 +1,29 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 
-# --- Import untuk dokumentasi ---
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="API Laris Amanah",
-      default_version='v1',
-      description="Dokumentasi API.",
-      contact=openapi.Contact(email="larisamanah@basisdata.com"),
-      license=openapi.License(name="bapakkuprogrammer"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
-
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('produk.urls')),
     path('user/', include('user.urls')),
     path('', lambda request: HttpResponse("Welcome to the API!")),
-    # URL untuk dokumentasi API
-    path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-]
\ No newline at end of file
+]
+
+# --- Metrik Prometheus (lihat backend/metrics.py) ---
+if settings.METRICS_ENABLED:
+    from .metrics import metrics_view
+
+    urlpatterns += [
+        path('metrics', metrics_view, name='metrics'),
+    ]
+
+# --- URL untuk dokumentasi API (skema statis, lihat backend/docs.py) ---
+if settings.API_DOCS_ENABLED:
+    from . import docs
+
+    urlpatterns += [
+        path('docs/', docs.swagger_ui, name='schema-swagger-ui'),
+        path('docs/openapi.json', docs.openapi_schema, name='schema-json'),
+        path('redoc/', docs.redoc_ui, name='schema-redoc'),
+    ]
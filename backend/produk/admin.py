@@ -1,6 +1,9 @@
 # farlliant/basis_data/basis_data-082a188571337ff8a3b1b4193fd9f8a80e851b83/backend/produk/admin.py
 from django.contrib import admin
-from .models import Produk, Transaksi
+from django.db.models import F
+from backend.sqlite import write_atomic
+from .models import Lokasi, Produk, StokLokasi, Transaksi, StokMutasi, StokSnapshot
+from .stock import as_decimal, record_movement
 
 @admin.register(Produk)
 class ProdukAdmin(admin.ModelAdmin):
@@ -8,13 +11,30 @@ class ProdukAdmin(admin.ModelAdmin):
     search_fields = ('kode_barang', 'nama_barang')
     list_filter = ('stok',)
     ordering = ('stok', 'kode_barang')
+    readonly_fields = ('version',)
+
+    def save_model(self, request, obj, form, change):
+        # Stock edited here goes into the ledger like any other change, in the
+        # same transaction, measured against the locked row rather than the form.
+        with write_atomic():
+            if change:
+                previous = Produk.objects.select_for_update().values_list('stok', flat=True).get(pk=obj.pk)
+                obj.version = F('version') + 1
+            super().save_model(request, obj, form, change)
+            obj.refresh_from_db(fields=['version'])
+            if not change:
+                if obj.stok:
+                    record_movement(obj, obj.stok, 'awal')
+            elif as_decimal(obj.stok) != as_decimal(previous):
+                record_movement(obj, as_decimal(obj.stok) - as_decimal(previous), 'penyesuaian')
 
 @admin.register(Transaksi)
 class TransaksiAdmin(admin.ModelAdmin):
-    list_display = ('id_transaksi', 'customer_name_display', 'produk_name_display', 'jumlah', 'total_harga', 'waktu_transaksi')
+    list_display = ('id_transaksi', 'customer_name_display', 'produk_name_display', 'lokasi', 'jumlah', 'total_harga', 'waktu_transaksi')
     search_fields = ('id_transaksi', 'customer__name', 'produk__nama_barang')
     list_filter = ('waktu_transaksi', 'produk__nama_barang')
     readonly_fields = ('total_harga', 'waktu_transaksi')
+    list_select_related = ('produk', 'customer', 'lokasi')
     date_hierarchy = 'waktu_transaksi'
 
     def customer_name_display(self, obj):
@@ -23,4 +43,31 @@ class TransaksiAdmin(admin.ModelAdmin):
 
     def produk_name_display(self, obj):
         return obj.produk.nama_barang if obj.produk else None
-    produk_name_display.short_description = 'Product Name'
\ No newline at end of file
+    produk_name_display.short_description = 'Product Name'
+
+@admin.register(StokMutasi)
+class StokMutasiAdmin(admin.ModelAdmin):
+    list_display = ('produk', 'lokasi', 'perubahan', 'alasan', 'transaksi', 'waktu')
+    search_fields = ('produk__kode_barang', 'produk__nama_barang')
+    list_filter = ('alasan', 'lokasi')
+    date_hierarchy = 'waktu'
+    readonly_fields = ('produk', 'lokasi', 'perubahan', 'alasan', 'transaksi', 'waktu')
+
+@admin.register(StokSnapshot)
+class StokSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('produk', 'stok', 'waktu')
+    search_fields = ('produk__kode_barang',)
+    date_hierarchy = 'waktu'
+
+@admin.register(Lokasi)
+class LokasiAdmin(admin.ModelAdmin):
+    list_display = ('kode_lokasi', 'nama_lokasi')
+    search_fields = ('kode_lokasi', 'nama_lokasi')
+
+@admin.register(StokLokasi)
+class StokLokasiAdmin(admin.ModelAdmin):
+    list_display = ('produk', 'lokasi', 'stok')
+    search_fields = ('produk__kode_barang', 'produk__nama_barang')
+    list_filter = ('lokasi',)
+    list_select_related = ('produk', 'lokasi')
+    readonly_fields = ('produk', 'lokasi', 'stok')
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class ProdukConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'produk'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from backend import sqlite  # noqa: F401  (connection_created hook)
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend import metrics
+from .models import Produk
+from .shared_catalog import shared_catalog
+
+CATALOG_CACHE_PREFIX = 'produk:catalog:'
+
+
+def catalog_cache_key(kode_barang):
+    return f"{CATALOG_CACHE_PREFIX}{kode_barang}"
+
+
+def get_produk_map(kode_barang_list, use_cache=False):
+    """
+    Resolves many produk at once and returns a {kode_barang: Produk} dict.
+    Misses are loaded with a single in_bulk query. With
+    PRODUK_SHARED_CATALOG on, the shared catalog is read first (its stok is
+    only a hint, see produk.shared_catalog). When use_cache is set, the
+    catalog cache is read next and refilled with whatever was loaded.
+    """
+    kode_barang_list = list(dict.fromkeys(kode_barang_list))
+    produk_map = {}
+
+    if settings.PRODUK_SHARED_CATALOG:
+        produk_map.update(shared_catalog.get_many(kode_barang_list))
+        if settings.METRICS_ENABLED:
+            metrics.cache_requests.inc(len(produk_map), cache='produk_shared_catalog', result='hit')
+            metrics.cache_requests.inc(len(kode_barang_list) - len(produk_map), cache='produk_shared_catalog', result='miss')
+
+    if use_cache:
+        looked_up = [kode for kode in kode_barang_list if kode not in produk_map]
+        cached = cache.get_many([catalog_cache_key(kode) for kode in looked_up])
+        for kode in looked_up:
+            produk = cached.get(catalog_cache_key(kode))
+            if produk is not None:
+                produk_map[kode] = produk
+        if settings.METRICS_ENABLED:
+            hits = sum(1 for kode in looked_up if kode in produk_map)
+            metrics.cache_requests.inc(hits, cache='produk_catalog', result='hit')
+            metrics.cache_requests.inc(len(looked_up) - hits, cache='produk_catalog', result='miss')
+
+    missing = [kode for kode in kode_barang_list if kode not in produk_map]
+    if missing:
+        loaded = Produk.objects.in_bulk(missing)
+        produk_map.update(loaded)
+        if use_cache and loaded:
+            cache.set_many(
+                {catalog_cache_key(kode): produk for kode, produk in loaded.items()},
+                timeout=settings.PRODUK_CATALOG_CACHE_TIMEOUT,
+            )
+
+    return produk_map
+
+
+def invalidate_produk(kode_barang_list, stock_only=False):
+    """
+    Drops the listed produk from the catalog cache and, once the change
+    commits, brings the shared catalog up to date. With stock_only (a sale
+    or other stock movement) the shared catalog patch is queued and made
+    in the background together with this process's other stock changes:
+    its stok is only a hint. Any other change is patched before the request
+    returns, so no worker prices a sale from a stale snapshot.
+    """
+    kode_barang_list = list(kode_barang_list)
+    cache.delete_many([catalog_cache_key(kode) for kode in kode_barang_list])
+    if settings.PRODUK_SHARED_CATALOG:
+        # Patched from the committed rows; a rolled back change never reaches it.
+        patch = shared_catalog.patch_later if stock_only else shared_catalog.patch
+        transaction.on_commit(lambda: patch(kode_barang_list), robust=True)
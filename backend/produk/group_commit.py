@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from backend.sqlite import write_atomic
+
+# Group commit untuk checkout tunggal (settings.CHECKOUT_GROUP_COMMIT).
+# Checkout yang datang bersamaan dalam satu jendela waktu dijalankan di satu
+# transaksi database, sehingga SQLite cukup sekali mengambil write lock dan
+# sekali fsync untuk banyak checkout.
+
+
+class GroupCommitTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Checkout tidak selesai tepat waktu, coba lagi nanti."
+    default_code = 'group_commit_timeout'
+
+
+class _Entry:
+    def __init__(self, work, key):
+        self.work = work
+        self.key = key
+        self.value = None
+        self.error = None
+        self.finished = threading.Event()
+        self._state_lock = threading.Lock()
+        self.started = False
+        self.cancelled = False
+
+    def start(self):
+        """Claims the entry for the flusher; False if its submitter gave up."""
+        with self._state_lock:
+            self.started = not self.cancelled
+            return self.started
+
+    def cancel(self):
+        """Withdraws the entry; False if the flusher already started it."""
+        with self._state_lock:
+            self.cancelled = not self.started
+            return self.cancelled
+
+
+class GroupCommitter:
+    """
+    Runs callables submitted from many request threads in shared database
+    transactions.
+
+    A flusher thread takes the first waiting callable, collects whatever
+    else arrives within CHECKOUT_GROUP_COMMIT_WINDOW_MS (up to
+    CHECKOUT_GROUP_COMMIT_MAX_BATCH), and runs the batch in one
+    write_atomic(), sorted by `key` so row locks are always taken in
+    the same order. Each callable runs in its own savepoint: one that raises
+    is rolled back alone and its exception is re-raised in the thread that
+    submitted it. If the commit itself fails, every request in the batch
+    gets that error.
+
+    A submitter waits at most CHECKOUT_GROUP_COMMIT_TIMEOUT_SECONDS for its
+    callable to start, and as long again for it to finish, before raising
+    GroupCommitTimeout. A callable that has not started by then is
+    withdrawn and never runs. A flusher thread that has died is restarted
+    on the next submit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self.batches = 0
+
+    def submit(self, work, key=''):
+        entry = _Entry(work, key)
+        self._ensure_flusher().put(entry)
+        timeout = settings.CHECKOUT_GROUP_COMMIT_TIMEOUT_SECONDS
+        if not entry.finished.wait(timeout):
+            if entry.cancel():
+                raise GroupCommitTimeout()
+            if not entry.finished.wait(timeout):
+                raise GroupCommitTimeout("Checkout masih berjalan; periksa transaksi sebelum mengulang.")
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker inherits the queue but not the flusher thread.
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                # Entries already queued are picked up by the new thread.
+                self._thread = threading.Thread(target=self._flush_forever, args=(self._queue,), name='group-commit', daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _flush_forever(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + settings.CHECKOUT_GROUP_COMMIT_WINDOW_MS / 1000
+            while len(batch) < settings.CHECKOUT_GROUP_COMMIT_MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        batch = [entry for entry in batch if entry.start()]
+        if not batch:
+            return
+        try:
+            close_old_connections()
+            with write_atomic():
+                for entry in sorted(batch, key=lambda entry: entry.key):
+                    try:
+                        with transaction.atomic():
+                            entry.value = entry.work()
+                    except Exception as e:
+                        entry.error = e
+        except Exception as e:
+            for entry in batch:
+                if entry.error is None:
+                    entry.error = e
+        finally:
+            self.batches += 1
+            for entry in batch:
+                entry.finished.set()
+
+
+checkout_committer = GroupCommitter()
@@ -0,0 +1,381 @@
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from backend.sqlite import write_atomic
+from produk.catalog import invalidate_produk
+from produk.models import LoadCheckpoint, Produk, ProdukTombstone, StokLokasi, StokMutasi, StokSnapshot, Transaksi
+from produk.sequences import transaksi_ids
+from produk.shared_catalog import shared_catalog
+from produk.serializers import ProdukSerializer, TransaksiImportSerializer
+from produk.stock import as_decimal, lock_produk
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+# Selama load: tanpa fsync per commit (proses yang mati tidak merusak
+# database, hanya listrik/OS yang mati), cache halaman 256 MB, tabel
+# sementara di memori. Nilai lama dikembalikan setelah selesai.
+SQLITE_BULK_PRAGMAS = {'synchronous': 'OFF', 'cache_size': '-262144', 'temp_store': 'MEMORY'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads a produk catalog or transaksi history from CSV or NDJSON. Rows are validated a chunk at a time "
+        "with the API's list serializers (one query per lookup table per chunk), written with bulk_create, and "
+        "take stock exactly like a checkout would: ledger rows, Produk/StokLokasi decremented in file order, "
+        "rows that would overdraw rejected. Each chunk commits together with a checkpoint, so an interrupted "
+        "load resumes where it stopped. Afterwards the deferred indexes are rebuilt, the tables analyzed and "
+        "stock snapshots written. Opening stock is dated --as-of; a sale dated before the first ledger row of "
+        "the stock it draws on is rejected, so load the catalog as of a time before the history it precedes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=['produk', 'transaksi'], help="What the file contains.")
+        parser.add_argument('path', help="CSV with a header row, or NDJSON (one JSON object per line).")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per transaction (default: 5000).")
+        parser.add_argument('--errors', help="Append rejected rows with their errors to this NDJSON file.")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and load the file from the start.")
+        parser.add_argument(
+            '--as-of',
+            help="produk only: when the file's stock was counted (ISO 8601). The opening ('awal') ledger rows are "
+                 "dated then, so transaksi history loaded afterwards replays on top of them (default: now).",
+        )
+        parser.add_argument(
+            '--keep-indexes',
+            action='store_true',
+            help="Keep the secondary indexes during the load (slower, but queries on a live database stay fast).",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"{path} does not exist.")
+        file_format = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if file_format is None:
+            raise CommandError(f"Cannot tell the format of {path} from its extension; pass --format.")
+
+        self.as_of = timezone.now()
+        if options['as_of']:
+            if options['model'] != 'produk':
+                raise CommandError("--as-of only applies to produk loads; transaksi carry their own waktu_transaksi.")
+            self.as_of = parse_datetime(options['as_of'])
+            if self.as_of is None:
+                raise CommandError(f"--as-of {options['as_of']!r} is not an ISO 8601 date and time.")
+            if timezone.is_naive(self.as_of):
+                self.as_of = timezone.make_aware(self.as_of)
+
+        source = f"{options['model']}:{os.path.realpath(path)}"[-255:]
+        file_size = os.path.getsize(path)
+        if options['restart']:
+            LoadCheckpoint.objects.filter(source=source).delete()
+        checkpoint, _ = LoadCheckpoint.objects.get_or_create(source=source, defaults={'file_size': file_size})
+        if checkpoint.file_size != file_size:
+            raise CommandError(
+                f"{path} changed since its checkpoint (row {checkpoint.rows_done}) was written; "
+                "pass --restart to load it from the start."
+            )
+        if checkpoint.finished:
+            self.stdout.write(
+                f"{path} is already loaded ({checkpoint.rows_done} rows, {checkpoint.rows_rejected} rejected); "
+                "pass --restart to load it again."
+            )
+            return
+        if checkpoint.rows_done:
+            self.stdout.write(f"Resuming after row {checkpoint.rows_done}.")
+
+        if options['model'] == 'produk':
+            load_chunk, models = self._load_produk, [Produk, StokMutasi]
+        else:
+            load_chunk, models = self._load_transaksi, [Transaksi, StokMutasi]
+            # Ids handed out for rows without one must stay clear of every
+            # explicit id further down the file.
+            highest = self._highest_id(path, file_format)
+            if highest is not None:
+                transaksi_ids.skip_past(highest)
+
+        errors_file = open(options['errors'], 'a') if options['errors'] else None
+        self.shown_errors = 0
+        started = last_progress = time.monotonic()
+        rows_at_start = checkpoint.rows_done
+        try:
+            with open(path, 'rb') as raw, self._bulk_load_pragmas(), self._deferred_indexes([] if options['keep_indexes'] else models):
+                text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+                rows = self._read(text, file_format)
+                next(itertools.islice(rows, checkpoint.rows_done, checkpoint.rows_done), None)
+                while chunk := list(itertools.islice(rows, options['chunk_size'])):
+                    first_row = checkpoint.rows_done + 1
+                    errors = load_chunk(chunk, checkpoint)
+                    self._report_errors(chunk, errors, first_row, errors_file)
+
+                    now = time.monotonic()
+                    if now - last_progress >= 2:
+                        last_progress = now
+                        rate = (checkpoint.rows_done - rows_at_start) / (now - started)
+                        self.stdout.write(
+                            f"{checkpoint.rows_done} rows ({raw.tell() / max(file_size, 1):.1%}), "
+                            f"{rate:.0f} rows/s, {checkpoint.rows_rejected} rejected"
+                        )
+                checkpoint.finished = True
+                checkpoint.save(update_fields=['finished', 'updated_at'])
+                elapsed = time.monotonic() - started
+                if not options['keep_indexes']:
+                    self.stdout.write("Rebuilding indexes...")
+        finally:
+            if errors_file is not None:
+                errors_file.close()
+
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        call_command('snapshot_stok', stdout=self.stdout)
+        if settings.PRODUK_SHARED_CATALOG:
+            # Bulk inserts send no signals: publish the loaded catalog in one go.
+            shared_catalog.rebuild()
+
+        loaded = checkpoint.rows_done - rows_at_start
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {path}: {checkpoint.rows_done} rows ({loaded} in this run, {loaded / max(elapsed, 1e-9):.0f} rows/s), "
+            f"{checkpoint.rows_rejected} rejected."
+        ))
+
+    def _read(self, text, file_format):
+        """Yields one dict per record. Empty CSV cells count as absent."""
+        if file_format == 'csv':
+            for row in csv.DictReader(text):
+                yield {key: value for key, value in row.items() if key is not None and value != ''}
+            return
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line  # Rejected by the serializer as "Invalid data"
+
+    def _highest_id(self, path, file_format):
+        highest = None
+        with open(path, encoding='utf-8-sig', newline='') as text:
+            for row in self._read(text, file_format):
+                value = row.get('id_transaksi') if isinstance(row, dict) else None
+                if isinstance(value, (int, str)) and str(value).strip().isdigit():
+                    highest = max(highest or 0, int(value))
+        return highest
+
+    def _advance(self, checkpoint, rows, rejected):
+        checkpoint.rows_done += rows
+        checkpoint.rows_rejected += rejected
+        checkpoint.save(update_fields=['rows_done', 'rows_rejected', 'updated_at'])
+
+    def _load_produk(self, chunk, checkpoint):
+        """
+        Same rows as POST /api/produk/ with a list: the product and, for a
+        non-zero stok, its 'awal' ledger row dated --as-of. Tombstones of
+        recreated codes are cleared, as the post_save handler would.
+        """
+        valid, errors = ProdukSerializer(many=True).partition(chunk)
+        for _, attrs in valid:
+            attrs.pop('version', None)  # New rows start at 1, as in ProdukSerializer.create
+        with write_atomic():
+            Produk.objects.bulk_create([Produk(**attrs) for _, attrs in valid])
+            StokMutasi.objects.bulk_create([
+                StokMutasi(produk_id=attrs['kode_barang'], perubahan=as_decimal(attrs['stok']), alasan='awal', waktu=self.as_of)
+                for _, attrs in valid if attrs.get('stok')
+            ])
+            ProdukTombstone.objects.filter(kode_barang__in=[attrs['kode_barang'] for _, attrs in valid]).delete()
+            self._advance(checkpoint, len(chunk), len(errors))
+        return errors
+
+    def _load_transaksi(self, chunk, checkpoint):
+        """
+        Same rows as POST /api/transaksi/ with a list, but set-based: the
+        chunk's stock rows are locked once, every sale is checked against the
+        running balance in file order, and the net change per stock row is
+        written next to the bulk-inserted transaksi and ledger rows.
+
+        Ledger rows carry the sale's waktu_transaksi, so as_of sees past sales
+        at their own time. A sale dated before the first ledger row of its
+        stock row (the opening stock it would draw on) is rejected: as_of
+        would go negative there. Snapshots of the affected products from
+        that time on no longer hold and are deleted; snapshot_stok rewrites
+        them after the load.
+        """
+        valid, errors = TransaksiImportSerializer(many=True).partition(chunk)
+
+        # Reserve every id before taking the write lock (see produk.sequences).
+        explicit = sum(1 for _, attrs in valid if attrs.get('id_transaksi') is not None)
+        fresh_ids = iter(transaksi_ids.allocate(len(valid) - explicit))
+
+        now = timezone.now()
+        with write_atomic():
+            central = {attrs['produk'].pk for _, attrs in valid if attrs.get('lokasi') is None}
+            pairs = {(attrs['produk'].pk, attrs['lokasi'].pk) for _, attrs in valid if attrs.get('lokasi') is not None}
+            stok = {kode: as_decimal(produk.stok) for kode, produk in lock_produk(central).items()}
+            # One query for every location row of the chunk's products and
+            # locations; lock_stok_lokasi's per-pair OR filter is too deep
+            # for SQLite at this size.
+            rows = StokLokasi.objects.select_for_update().filter(
+                produk_id__in={kode for kode, _ in pairs},
+                lokasi_id__in={kode for _, kode in pairs},
+            ).order_by('produk_id', 'lokasi_id').values_list('produk_id', 'lokasi_id', 'stok')
+            stok.update({(kode, lokasi): as_decimal(value) for kode, lokasi, value in rows if (kode, lokasi) in pairs})
+            opened = self._opened(central, pairs)
+
+            deltas = defaultdict(Decimal)
+            instances, movements = [], []
+            for index, attrs in valid:
+                produk, lokasi, jumlah = attrs['produk'], attrs.get('lokasi'), attrs['jumlah']
+                key = (produk.pk, lokasi.pk) if lokasi is not None else produk.pk
+                if key not in stok:
+                    errors[index] = {'non_field_errors': [f"{produk.nama_barang} tidak tersedia di {lokasi.nama_lokasi}."]}
+                    continue
+                waktu = attrs.get('waktu_transaksi') or now
+                if key in opened and waktu < opened[key]:
+                    where = f" di {lokasi.nama_lokasi}" if lokasi is not None else ""
+                    errors[index] = {'waktu_transaksi': [
+                        f"Sebelum stok awal {produk.nama_barang}{where} tercatat ({opened[key].isoformat()}); "
+                        "muat katalognya dengan --as-of yang lebih awal."
+                    ]}
+                    continue
+                available = stok[key] + deltas[key]
+                if available < jumlah:
+                    where = f" di {lokasi.nama_lokasi}" if lokasi is not None else ""
+                    errors[index] = {'non_field_errors': [f"Stok tidak cukup untuk {produk.nama_barang}{where}. Tersedia: {available}"]}
+                    continue
+                deltas[key] -= jumlah
+
+                id_transaksi = attrs.get('id_transaksi')
+                if id_transaksi is None:
+                    id_transaksi = next(fresh_ids)
+                total_harga = attrs.get('total_harga')
+                instances.append(Transaksi(
+                    id_transaksi=id_transaksi,
+                    customer=attrs['customer'],
+                    produk=produk,
+                    lokasi=lokasi,
+                    jumlah=jumlah,
+                    total_harga=total_harga if total_harga is not None else produk.harga_satuan * jumlah,
+                    waktu_transaksi=attrs.get('waktu_transaksi', now),
+                ))
+                movements.append(StokMutasi(
+                    produk=produk, perubahan=-jumlah, alasan='penjualan', transaksi_id=id_transaksi, lokasi=lokasi,
+                    waktu=waktu,
+                ))
+
+            Transaksi.objects.bulk_create(instances)
+            StokMutasi.objects.bulk_create(movements)
+            central_moves = [movement for movement in movements if movement.lokasi is None]
+            if central_moves:
+                StokSnapshot.objects.filter(
+                    produk__in={movement.produk_id for movement in central_moves},
+                    waktu__gte=min(movement.waktu for movement in central_moves),
+                ).delete()
+            self._apply_deltas(deltas, now)
+            self._advance(checkpoint, len(chunk), len(errors))
+        return errors
+
+    def _opened(self, central, pairs):
+        """
+        The time of the first ledger row of every listed stock row that has
+        one: {kode_barang: waktu} for central stock, {(kode_barang,
+        kode_lokasi): waktu} for location stock.
+        """
+        opened = dict(
+            StokMutasi.objects.filter(produk__in=central, lokasi__isnull=True)
+            .values('produk').annotate(first=Min('waktu')).values_list('produk', 'first')
+        )
+        if pairs:
+            rows = (
+                StokMutasi.objects.filter(produk__in={kode for kode, _ in pairs}, lokasi__in={kode for _, kode in pairs})
+                .values('produk', 'lokasi').annotate(first=Min('waktu')).values_list('produk', 'lokasi', 'first')
+            )
+            opened.update({(kode, lokasi): first for kode, lokasi, first in rows if (kode, lokasi) in pairs})
+        return opened
+
+    def _apply_deltas(self, deltas, now):
+        """
+        apply_stock_deltas/apply_lokasi_deltas for a whole chunk: one keyed
+        UPDATE per stock row through executemany, which stays linear where a
+        CASE over thousands of products does not.
+        """
+        quote = connection.ops.quote_name
+        updated_at = Produk._meta.get_field('updated_at').get_db_prep_value(now, connection)
+        central = sorted((kode, delta) for kode, delta in deltas.items() if delta and not isinstance(kode, tuple))
+        lokasi = sorted((pair, delta) for pair, delta in deltas.items() if delta and isinstance(pair, tuple))
+        with connection.cursor() as cursor:
+            if central:
+                cursor.executemany(
+                    f"UPDATE {quote(Produk._meta.db_table)} SET stok = stok + %s, updated_at = %s, version = version + 1 WHERE kode_barang = %s",
+                    [(delta, updated_at, kode) for kode, delta in central],
+                )
+            if lokasi:
+                cursor.executemany(
+                    f"UPDATE {quote(StokLokasi._meta.db_table)} SET stok = stok + %s WHERE produk_id = %s AND lokasi_id = %s",
+                    [(delta, kode, kode_lokasi) for (kode, kode_lokasi), delta in lokasi],
+                )
+        # Raw updates send no post_save, so the catalog cache is cleared here.
+        invalidate_produk([kode for kode, _ in central], stock_only=True)
+
+    def _report_errors(self, chunk, errors, first_row, errors_file):
+        for index in sorted(errors):
+            if errors_file is not None:
+                errors_file.write(json.dumps({'row': first_row + index, 'data': chunk[index], 'errors': errors[index]}) + '\n')
+            elif self.shown_errors < 10:
+                self.shown_errors += 1
+                self.stderr.write(f"Row {first_row + index} rejected: {json.dumps(errors[index])}")
+
+    @contextmanager
+    def _bulk_load_pragmas(self):
+        if connection.vendor != 'sqlite':
+            yield
+            return
+        previous = {}
+        with connection.cursor() as cursor:
+            for name, value in SQLITE_BULK_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}")
+                previous[name] = cursor.fetchone()[0]
+                cursor.execute(f"PRAGMA {name} = {value}")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                for name, value in previous.items():
+                    cursor.execute(f"PRAGMA {name} = {value}")
+
+    @contextmanager
+    def _deferred_indexes(self, models):
+        """
+        Drops the models' Meta.indexes for the load, so each insert only
+        maintains the primary key, and creates whatever is missing afterwards
+        (also after a failed or interrupted load, or one killed earlier).
+        """
+        indexes = [(model, index) for model in models for index in model._meta.indexes]
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                if self._has_index(model, index):
+                    editor.remove_index(model, index)
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    if not self._has_index(model, index):
+                        editor.add_index(model, index)
+
+    def _has_index(self, model, index):
+        with connection.cursor() as cursor:
+            return index.name in connection.introspection.get_constraints(cursor, model._meta.db_table)
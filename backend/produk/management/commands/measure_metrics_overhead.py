@@ -0,0 +1,117 @@
+import statistics
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures what the /metrics instrumentation adds to request time. Runs a mix of produk, transaksi "
+        "and report requests to get the real time and query count per request, then times MetricsMiddleware "
+        "itself around a handler that runs the same number of queries, with and without it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=10, help="Timed rounds over the request mix (default: 10).")
+        parser.add_argument('--requests', type=int, default=20, help="Passes over the request mix per round (default: 20).")
+        parser.add_argument('--iterations', type=int, default=20000, help="Calls per middleware timing (default: 20000).")
+
+    def handle(self, *args, **options):
+        from backend.metrics import MetricsMiddleware
+        from produk.models import ProdukTombstone, Transaksi
+        from produk.serializers import ProdukSerializer
+        from user.models import User
+
+        run_id = uuid.uuid4().hex[:8]
+        customer = User.objects.create(
+            name=f"metrics-{run_id}",
+            email=f"metrics-{run_id}@customer.invalid",
+            password=uuid.uuid4().hex,
+            is_active=False,
+        )
+        serializer = ProdukSerializer(data={
+            'kode_barang': f"MT{run_id}",
+            'nama_barang': f"Metrics overhead {run_id}",
+            'stok': 10 ** 6,
+            'satuan': 'Pcs',
+            'harga_satuan': '1000.00',
+        })
+        serializer.is_valid(raise_exception=True)
+        produk = serializer.save()
+
+        client = APIClient()
+        mix = [
+            lambda: client.get('/api/produk/', {'search': produk.pk}),
+            lambda: client.get(f'/api/produk/{produk.pk}/'),
+            lambda: client.post('/api/transaksi/', {'customer': customer.name, 'produk': produk.pk, 'jumlah': 1}, format='json'),
+            lambda: client.post('/api/produk/quote/?cache=true', [{'kode_barang': produk.pk, 'jumlah': 1}], format='json'),
+            lambda: client.get('/api/report/'),
+        ]
+
+        try:
+            with tempfile.TemporaryDirectory() as metrics_dir, \
+                    override_settings(THROTTLE_ENABLED=False, METRICS_ENABLED=True, METRICS_DIR=metrics_dir):
+                with CaptureQueriesContext(connection) as captured:
+                    for send in mix:
+                        send()
+                queries_per_request = round(len(captured) / len(mix))
+
+                # Real request time, metrics on; the first round only warms up.
+                request_times = []
+                for round_number in range(options['rounds'] + 1):
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        for send in mix:
+                            send()
+                    if round_number:
+                        request_times.append((time.perf_counter() - started) / (options['requests'] * len(mix)))
+
+                overhead = self._middleware_overhead(MetricsMiddleware, queries_per_request, options['iterations'])
+        finally:
+            with transaction.atomic():
+                Transaksi.objects.filter(produk=produk).delete()
+                kode_barang = produk.pk
+                produk.delete()
+                # Offline clients never saw the scratch product: drop the tombstone post_delete wrote.
+                ProdukTombstone.objects.filter(kode_barang=kode_barang).delete()
+                customer.delete()
+
+        request_time = statistics.median(request_times)
+        percent = overhead / request_time * 100
+        self.stdout.write(f"Request time:    median {request_time * 1000:.3f} ms per request, {queries_per_request} queries")
+        message = f"Instrumentation: {overhead * 1e6:.1f} us per request ({percent:.2f}% of request time)"
+        self.stdout.write(self.style.SUCCESS(message) if percent < 1 else self.style.WARNING(message))
+
+    def _middleware_overhead(self, middleware_class, queries, iterations):
+        """
+        Seconds MetricsMiddleware adds to one request that runs `queries`
+        queries: the same handler timed with and without the middleware,
+        interleaved, median of five.
+        """
+        request = RequestFactory().get('/api/produk/')
+        request.resolver_match = resolve('/api/produk/')
+        response = HttpResponse()
+
+        def handler(request):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute("SELECT 1")
+            return response
+
+        wrapped = middleware_class(handler)
+        samples = {handler: [], wrapped: []}
+        for _ in range(5):
+            for call in (handler, wrapped):
+                started = time.perf_counter()
+                for _ in range(iterations // 5):
+                    call(request)
+                samples[call].append((time.perf_counter() - started) / (iterations // 5))
+        return max(statistics.median(samples[wrapped]) - statistics.median(samples[handler]), 0)
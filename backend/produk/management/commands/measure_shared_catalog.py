@@ -0,0 +1,122 @@
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares resolving produk from the database, from the catalog cache and from the shared catalog "
+        "snapshot (produk.shared_catalog), then counts the queries and time of the produk detail, quote and "
+        "checkout requests with the shared catalog off and on. Uses scratch products and a scratch snapshot file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produk', type=int, default=1000, help="Scratch products in the catalog (default: 1000).")
+        parser.add_argument('--batch', type=int, nargs='+', default=[1, 20], help="Codes per lookup (default: 1 20).")
+        parser.add_argument('--iterations', type=int, default=2000, help="Lookups per timing (default: 2000).")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint timing (default: 200).")
+
+    def handle(self, *args, **options):
+        from produk.catalog import get_produk_map
+        from produk.models import Produk, ProdukTombstone, Transaksi
+        from produk.shared_catalog import shared_catalog
+        from user.models import User
+
+        run_id = uuid.uuid4().hex[:8]
+        customer = User.objects.create(
+            name=f"catalog-{run_id}",
+            email=f"catalog-{run_id}@customer.invalid",
+            password=uuid.uuid4().hex,
+            is_active=False,
+        )
+        kode_barang_list = [f"SC{run_id}{i}" for i in range(options['produk'])]
+        Produk.objects.bulk_create([
+            Produk(kode_barang=kode, nama_barang=f"Shared catalog {run_id} #{i}", stok=10 ** 6, satuan='Pcs', harga_satuan='1000.00')
+            for i, kode in enumerate(kode_barang_list)
+        ])
+
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                THROTTLE_ENABLED=False,
+                PRODUK_SHARED_CATALOG_PATH=os.path.join(directory, 'produk-catalog.bin'),
+            ):
+                started = time.perf_counter()
+                shared_catalog.rebuild()
+                self.stdout.write(
+                    f"Snapshot of {Produk.objects.count()} produk built in {(time.perf_counter() - started) * 1000:.1f} ms, "
+                    f"{os.path.getsize(shared_catalog.path) / 1024:.0f} KiB"
+                )
+
+                self.stdout.write("")
+                self.stdout.write(f"{'batch':>6} {'database':>11} {'cache':>11} {'shared':>11}   (µs per lookup call)")
+                for batch in options['batch']:
+                    timings = {}
+                    for source, use_cache, shared in (('database', False, False), ('cache', True, False), ('shared', False, True)):
+                        with override_settings(PRODUK_SHARED_CATALOG=shared):
+                            timings[source] = self._time_lookups(
+                                lambda codes: get_produk_map(codes, use_cache=use_cache),
+                                kode_barang_list, batch, options['iterations'],
+                            )
+                    self.stdout.write(
+                        f"{batch:>6} {timings['database']:>11.1f} {timings['cache']:>11.1f} {timings['shared']:>11.1f}"
+                    )
+
+                self.stdout.write("")
+                self.stdout.write(f"{'request':>10} {'shared':>7} {'queries':>8} {'mean ms':>8}")
+                client = APIClient()
+                kode = kode_barang_list[0]
+                requests = {
+                    'detail': lambda: client.get(f'/api/produk/{kode}/'),
+                    'quote': lambda: client.post(
+                        '/api/produk/quote/', [{'kode_barang': k, 'jumlah': 1} for k in kode_barang_list[:20]], format='json',
+                    ),
+                    'checkout': lambda: client.post(
+                        '/api/transaksi/', {'customer': customer.name, 'produk': kode, 'jumlah': 1}, format='json',
+                    ),
+                }
+                for name, send in requests.items():
+                    for shared in (False, True):
+                        with override_settings(PRODUK_SHARED_CATALOG=shared):
+                            queries, mean = self._time_request(send, options['requests'])
+                        self.stdout.write(f"{name:>10} {'on' if shared else 'off':>7} {queries:>8} {mean * 1000:>8.2f}")
+        finally:
+            Transaksi.objects.filter(produk__in=kode_barang_list).delete()
+            Produk.objects.filter(kode_barang__in=kode_barang_list).delete()
+            # Offline clients never saw the scratch products: drop the tombstones post_delete wrote.
+            ProdukTombstone.objects.filter(kode_barang__in=kode_barang_list).delete()
+            customer.delete()
+            cache.clear()
+
+    def _time_lookups(self, lookup, kode_barang_list, batch, iterations):
+        batches = [
+            kode_barang_list[(i * batch) % len(kode_barang_list):][:batch] or kode_barang_list[:batch]
+            for i in range(iterations)
+        ]
+        for codes in batches[:50]:
+            lookup(codes)  # Warm up (and fill the cache)
+        started = time.perf_counter()
+        for codes in batches:
+            lookup(codes)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+    def _time_request(self, send, count):
+        response = send()
+        assert 200 <= response.status_code < 300, response.content
+        reset_queries()  # The lookup timings above filled the query log
+        with CaptureQueriesContext(connection) as queries:
+            send()
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            send()
+            timings.append(time.perf_counter() - started)
+        return len(queries), statistics.mean(timings)
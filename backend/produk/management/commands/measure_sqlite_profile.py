@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+# Models are imported inside the functions below: spawned worker processes
+# import this module before django.setup() has run.
+
+MODES = {
+    # Django's defaults before backend.sqlite: rollback journal, synchronous=FULL,
+    # deferred transactions and the 5 s timeout of the sqlite3 module.
+    'default': {'enabled': False, 'journal_mode': 'DELETE'},
+    'profile': {'enabled': True, 'journal_mode': 'WAL'},
+}
+
+
+@contextmanager
+def _scratch_database(path, enabled):
+    """Points the default connection at `path`, with the profile on or off."""
+    from django.test import override_settings
+
+    settings_dict = connections['default'].settings_dict
+    name = settings_dict['NAME']
+    connections.close_all()
+    settings_dict['NAME'] = path
+    try:
+        with override_settings(SQLITE_PROFILE_ENABLED=enabled, THROTTLE_ENABLED=False):
+            yield
+    finally:
+        connections.close_all()
+        settings_dict['NAME'] = name
+
+
+def _classify(response):
+    if 200 <= response.status_code < 300:
+        return 'ok'
+    body = str(getattr(response, 'data', response.content))
+    if 'locked' in body:
+        return 'database_locked'
+    return f'http_{response.status_code}'
+
+
+def _run_threads(options, kode_barang_list, customer_name, start):
+    """
+    Runs options['readers'] reading and options['writers'] checkout threads
+    in this process until options['seconds'] have passed. Reads are produk
+    detail and search requests, with a sales report every tenth read.
+    """
+    from rest_framework.test import APIClient
+
+    latencies = {'read': [], 'write': []}
+    outcomes = {'read': Counter(), 'write': Counter()}
+    mutex = threading.Lock()
+
+    def client_thread(kind, seed):
+        rng = random.Random(seed)
+        client = APIClient()
+        deadline = start + options['seconds']
+        try:
+            while time.monotonic() < deadline:
+                kode_barang = rng.choice(kode_barang_list)
+                started = time.perf_counter()
+                try:
+                    if kind == 'write':
+                        response = client.post(
+                            '/api/transaksi/',
+                            {'customer': customer_name, 'produk': kode_barang, 'jumlah': 1},
+                            format='json',
+                        )
+                    elif rng.random() < 0.1:
+                        response = client.get('/api/report/')
+                    elif rng.random() < 0.5:
+                        response = client.get(f'/api/produk/{kode_barang}/')
+                    else:
+                        response = client.get('/api/produk/', {'search': kode_barang})
+                    outcome = _classify(response)
+                except OperationalError as e:
+                    outcome = 'database_locked' if 'locked' in str(e) else 'operational_error'
+                elapsed = time.perf_counter() - started
+                with mutex:
+                    latencies[kind].append(elapsed)
+                    outcomes[kind][outcome] += 1
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=client_thread, args=(kind, f"{options['seed']}-{uuid.uuid4()}"))
+        for kind, count in (('read', options['readers']), ('write', options['writers']))
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'latencies': latencies, 'outcomes': {kind: dict(counter) for kind, counter in outcomes.items()}}
+
+
+def _worker_process(options, path, enabled, kode_barang_list, customer_name, barrier, results):
+    import django
+    django.setup()
+    with _scratch_database(path, enabled):
+        # Every process starts the clock together, after its (slow) setup.
+        barrier.wait()
+        results.put(_run_threads(options, kode_barang_list, customer_name, time.monotonic()))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares mixed read/write throughput on SQLite with Django's default connection settings and with "
+        "settings.SQLITE_PROFILE (WAL, busy_timeout, synchronous=NORMAL, mmap, cache, IMMEDIATE write transactions). "
+        "Each round runs on its own copy of the configured database, so the real file is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help="Worker processes (default: 2).")
+        parser.add_argument('--readers', type=int, default=4, help="Reading client threads per process (default: 4).")
+        parser.add_argument('--writers', type=int, default=2, help="Checkout client threads per process (default: 2).")
+        parser.add_argument('--seconds', type=float, default=5, help="Duration of each round (default: 5).")
+        parser.add_argument('--produk', type=int, default=20, help="Scratch products to read and sell (default: 20).")
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help="Rounds to run (default: both).")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The SQLite profile only applies to the sqlite3 backend.")
+
+        summaries = []
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in options['modes']:
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                self._copy_database(path, MODES[mode]['journal_mode'])
+                summaries.append(self._round(options, mode, path))
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'mode':>8} {'reads/s':>9} {'writes/s':>9} {'read p95':>9} {'write p95':>10} {'locked':>7} {'errors':>7}"
+        )
+        for summary in summaries:
+            self.stdout.write(
+                f"{summary['mode']:>8} {summary['reads_per_s']:>9.1f} {summary['writes_per_s']:>9.1f} "
+                f"{summary['read_p95'] * 1000:>7.1f}ms {summary['write_p95'] * 1000:>8.1f}ms "
+                f"{summary['locked']:>7} {summary['error_rate']:>6.1f}%"
+            )
+
+    def _copy_database(self, path, journal_mode):
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+            target.execute(f"PRAGMA journal_mode = {journal_mode}")
+        finally:
+            target.close()
+
+    def _round(self, options, mode, path):
+        from produk.serializers import ProdukSerializer
+        from user.models import User
+
+        enabled = MODES[mode]['enabled']
+        run_id = uuid.uuid4().hex[:8]
+        with _scratch_database(path, enabled):
+            customer = User.objects.create(
+                name=f"sqlite-{run_id}",
+                email=f"sqlite-{run_id}@customer.invalid",
+                password=uuid.uuid4().hex,
+                is_active=False,
+            )
+            kode_barang_list = []
+            for i in range(options['produk']):
+                serializer = ProdukSerializer(data={
+                    'kode_barang': f"SQ{run_id}{i}",
+                    'nama_barang': f"SQLite profile {run_id} #{i}",
+                    'stok': 10 ** 6,
+                    'satuan': 'Pcs',
+                    'harga_satuan': '1000.00',
+                })
+                serializer.is_valid(raise_exception=True)
+                kode_barang_list.append(serializer.save().pk)
+
+        self.stdout.write(
+            f"[{mode}] {options['processes']} process(es) x ({options['readers']} reader(s) + "
+            f"{options['writers']} writer(s)) for {options['seconds']:g}s..."
+        )
+        worker_options = {key: options[key] for key in ('readers', 'writers', 'seconds', 'seed')}
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(options['processes'])
+        queue = context.Queue()
+        processes = [
+            context.Process(
+                target=_worker_process,
+                args=(worker_options, path, enabled, kode_barang_list, customer.name, barrier, queue),
+            )
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        return self._report(options, mode, results)
+
+    def _report(self, options, mode, results):
+        latencies = {kind: [v for r in results for v in r['latencies'][kind]] for kind in ('read', 'write')}
+        outcomes = {kind: Counter() for kind in ('read', 'write')}
+        for result in results:
+            for kind in outcomes:
+                outcomes[kind].update(result['outcomes'][kind])
+
+        seconds = options['seconds']
+        total = sum(sum(counter.values()) for counter in outcomes.values())
+        errors = total - outcomes['read']['ok'] - outcomes['write']['ok']
+        locked = outcomes['read']['database_locked'] + outcomes['write']['database_locked']
+        for kind in ('read', 'write'):
+            self.stdout.write(
+                f"  {kind + 's':<7} {outcomes[kind]['ok'] / seconds:>8.1f}/s ok, "
+                f"p50 {_percentile(latencies[kind], 50) * 1000:.1f} ms, p95 {_percentile(latencies[kind], 95) * 1000:.1f} ms, "
+                f"max {max(latencies[kind], default=0) * 1000:.1f} ms {dict(outcomes[kind])}"
+            )
+        return {
+            'mode': mode,
+            'reads_per_s': outcomes['read']['ok'] / seconds,
+            'writes_per_s': outcomes['write']['ok'] / seconds,
+            'read_p95': _percentile(latencies['read'], 95),
+            'write_p95': _percentile(latencies['write'], 95),
+            'locked': locked,
+            'error_rate': errors / total * 100 if total else 0,
+        }
@@ -0,0 +1,56 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: everything a worker does before serving its
+# first request (settings, app registry, URLconf).
+BOOT_SCRIPT = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if {eager_docs}:
+    # What backend/urls.py used to do at import time.
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    get_schema_view(openapi.Info(title='x', default_version='v1'), public=True)
+print(time.perf_counter() - started)
+"""
+
+SCENARIOS = [
+    ('docs disabled', '0', False),
+    ('docs enabled, static schema', '1', False),
+    ('docs enabled, schema view built at import (old)', '1', True),
+]
+
+
+class Command(BaseCommand):
+    help = "Measures worker boot time with the API documentation disabled, served statically, and built eagerly."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10, help="Fresh interpreters per scenario (default: 10).")
+
+    def handle(self, *args, **options):
+        timings = {label: [] for label, _, _ in SCENARIOS}
+        # Interleave the scenarios so disk cache warm-up is shared evenly.
+        for _ in range(options['runs'] + 1):
+            for label, docs_enabled, eager in SCENARIOS:
+                output = subprocess.run(
+                    [sys.executable, '-c', BOOT_SCRIPT.format(eager_docs=eager)],
+                    env=dict(os.environ, API_DOCS_ENABLED=docs_enabled),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                timings[label].append(float(output.stdout.strip().splitlines()[-1]))
+
+        # The first round only warms caches.
+        results = {label: statistics.median(values[1:]) for label, values in timings.items()}
+        baseline = results[SCENARIOS[-1][0]]
+        for label, median in results.items():
+            self.stdout.write(f"{label:<50} median {median * 1000:7.1f} ms ({(baseline - median) * 1000:+.1f} ms vs old)")
@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.sqlite import write_atomic
+from produk.models import Produk
+from produk.stock import as_decimal, stock_as_of, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Writes per-product stock snapshots so as_of queries only replay recent ledger movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag',
+            type=int,
+            default=60,
+            help="Snapshot the state this many seconds ago, so checkouts still committing are not missed (default: 60).",
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Also report products whose Produk.stok differs from the stock rebuilt from the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(seconds=options['lag'])
+
+        with write_atomic():
+            written = take_snapshots(cutoff)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} snapshot(s) at {cutoff.isoformat()}."))
+
+        if options['check']:
+            drift = 0
+            for kode_barang, stok, stok_ledger in stock_as_of(timezone.now()).values_list('kode_barang', 'stok', 'stok_as_of'):
+                if as_decimal(stok) != as_decimal(stok_ledger):
+                    drift += 1
+                    self.stdout.write(f"{kode_barang}: stok={stok}, ledger={stok_ledger}")
+            checked = Produk.objects.count()
+            style = self.style.WARNING if drift else self.style.SUCCESS
+            self.stdout.write(style(f"{drift} of {checked} produk drifted from the ledger."))
@@ -0,0 +1,339 @@
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+# Models are imported inside the functions below: spawned worker processes
+# import this module before django.setup() has run.
+
+
+def _classify(response):
+    if response.status_code == 201:
+        return 'ok'
+    body = str(getattr(response, 'data', response.content))
+    if 'locked' in body:
+        return 'database_locked'
+    if 'Stok tidak cukup' in body:
+        return 'out_of_stock'
+    return f'http_{response.status_code}'
+
+
+def _run_threads(options, kode_barang_list, customer_name, kode_lokasi_list):
+    """
+    Runs options['threads'] client threads in this process, each sending
+    options['requests'] checkouts through the real URL resolver, viewset and
+    database. Returns the raw measurements for the parent to merge.
+
+    The stress run measures the database, not the API rate limits, so
+    throttling is switched off for it. options['group_commit_ms'] > 0 turns
+    on group commit with that window.
+    """
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from backend.sqlite import write_lock_acquired
+    from produk.group_commit import checkout_committer
+    from produk.signals import stock_lock_acquired
+
+    # BEGIN waits for the database write lock (SQLite), row waits for the stock row.
+    begin_waits = []
+    lock_waits = []
+    lock_waits_mutex = threading.Lock()
+
+    def on_begin(sender, wait, **kwargs):
+        with lock_waits_mutex:
+            begin_waits.append(wait)
+
+    def on_lock(sender, wait, **kwargs):
+        with lock_waits_mutex:
+            lock_waits.append(wait)
+
+    write_lock_acquired.connect(on_begin, weak=False)
+    stock_lock_acquired.connect(on_lock, weak=False)
+
+    latencies = []
+    outcomes = Counter()
+    committed = defaultdict(Decimal)
+    mutex = threading.Lock()
+
+    def client_thread(seed):
+        rng = random.Random(seed)
+        client = APIClient()
+        try:
+            for _ in range(options['requests']):
+                lines = [
+                    {
+                        'customer': customer_name,
+                        'produk': rng.choice(kode_barang_list),
+                        'lokasi': rng.choice(kode_lokasi_list) if kode_lokasi_list else None,
+                        'jumlah': str(options['jumlah']),
+                    }
+                    for _ in range(options['bulk'] or 1)
+                ]
+                payload = lines if options['bulk'] else lines[0]
+
+                started = time.perf_counter()
+                response = client.post('/api/transaksi/', payload, format='json')
+                elapsed = time.perf_counter() - started
+
+                outcome = _classify(response)
+                with mutex:
+                    latencies.append(elapsed)
+                    outcomes[outcome] += 1
+                    if outcome == 'ok':
+                        for line in lines:
+                            committed[(line['produk'], line['lokasi'])] += Decimal(line['jumlah'])
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=client_thread, args=(f"{options['seed']}-{uuid.uuid4()}",))
+        for _ in range(options['threads'])
+    ]
+    with override_settings(
+        THROTTLE_ENABLED=False,
+        CHECKOUT_GROUP_COMMIT=options['group_commit_ms'] > 0,
+        CHECKOUT_GROUP_COMMIT_WINDOW_MS=options['group_commit_ms'],
+    ):
+        batches_before = checkout_committer.batches
+        started_at = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        finished_at = time.time()
+
+    write_lock_acquired.disconnect(on_begin)
+    stock_lock_acquired.disconnect(on_lock)
+    return {
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'latencies': latencies,
+        'begin_waits': begin_waits,
+        'lock_waits': lock_waits,
+        'outcomes': dict(outcomes),
+        'committed': dict(committed),
+        'group_commits': checkout_committer.batches - batches_before,
+    }
+
+
+def _worker_process(options, kode_barang_list, customer_name, kode_lokasi_list):
+    import django
+    django.setup()
+    return _run_threads(options, kode_barang_list, customer_name, kode_lokasi_list)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent checkouts from many threads and processes against the configured database, "
+        "reports throughput, lock-wait time and error rate, and verifies that no stock was oversold. "
+        "Compare --lokasi 0 with --lokasi N to see how spreading checkouts over N stores changes contention, "
+        "and --group-commit-ms 0 2 5 to compare commits per second with the latency group commit adds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help="Worker processes (default: 2).")
+        parser.add_argument('--threads', type=int, default=4, help="Client threads per process (default: 4).")
+        parser.add_argument('--requests', type=int, default=50, help="Checkouts sent by each thread (default: 50).")
+        parser.add_argument('--bulk', type=int, default=0, help="Lines per checkout; 0 sends single-item payloads (default: 0).")
+        parser.add_argument('--produk', type=int, default=1, help="Number of scratch products to spread checkouts over (default: 1).")
+        parser.add_argument('--lokasi', type=int, default=0, help="Scratch store locations to spread checkouts over; 0 sells from the central stock (default: 0).")
+        parser.add_argument('--stok', type=int, default=200, help="Starting stock of every scratch product, per location when --lokasi is set (default: 200).")
+        parser.add_argument('--jumlah', type=int, default=1, help="Quantity per checkout line (default: 1).")
+        parser.add_argument(
+            '--group-commit-ms', type=float, nargs='+', default=[0],
+            help="Group-commit window(s) in ms for single checkouts; 0 commits every checkout on its own. "
+                 "Several values run one round each and end with a comparison (default: 0).",
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help="Keep the scratch products, customer and transaksi afterwards.")
+
+    def handle(self, *args, **options):
+        summaries = []
+        for window in options['group_commit_ms']:
+            summaries.append(self._round({**options, 'group_commit_ms': window}))
+
+        if len(summaries) > 1:
+            self.stdout.write("")
+            self.stdout.write(f"{'window':>8} {'committed/s':>12} {'per commit':>11} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+            for summary in summaries:
+                self.stdout.write(
+                    f"{summary['window']:>6g}ms {summary['committed_per_s']:>12.1f} {summary['per_commit']:>11.1f} "
+                    f"{summary['p50'] * 1000:>8.1f} {summary['p95'] * 1000:>8.1f} {summary['error_rate']:>6.1f}%"
+                )
+
+    def _round(self, options):
+        from produk.models import Lokasi, Produk, ProdukTombstone, Transaksi
+        from produk.serializers import ProdukSerializer
+        from produk.stock import transfer_stock
+        from user.models import User
+
+        run_id = uuid.uuid4().hex[:8]
+        customer = User.objects.create(
+            name=f"stress-{run_id}",
+            email=f"stress-{run_id}@customer.invalid",
+            password=uuid.uuid4().hex,
+            is_active=False,
+        )
+        lokasi_list = [
+            Lokasi.objects.create(kode_lokasi=f"ST{run_id}L{i}", nama_lokasi=f"Stress test {run_id} store {i}")
+            for i in range(options['lokasi'])
+        ]
+        kode_barang_list = []
+        for i in range(options['produk']):
+            serializer = ProdukSerializer(data={
+                'kode_barang': f"ST{run_id}{i}",
+                'nama_barang': f"Stress test {run_id} #{i}",
+                'stok': options['stok'] * max(1, len(lokasi_list)),
+                'satuan': 'Pcs',
+                'harga_satuan': '1000.00',
+            })
+            serializer.is_valid(raise_exception=True)
+            produk = serializer.save()
+            kode_barang_list.append(produk.pk)
+            for lokasi in lokasi_list:
+                with transaction.atomic():
+                    transfer_stock(produk, lokasi, options['stok'])
+        kode_lokasi_list = [lokasi.pk for lokasi in lokasi_list]
+
+        try:
+            results = self._run(options, kode_barang_list, customer.name, kode_lokasi_list)
+            summary = self._report(options, results)
+            self._verify(options, kode_barang_list, kode_lokasi_list, results)
+            return summary
+        finally:
+            if not options['keep']:
+                with transaction.atomic():
+                    Transaksi.objects.filter(produk__in=kode_barang_list).delete()
+                    Produk.objects.filter(kode_barang__in=kode_barang_list).delete()
+                    # Offline clients never saw the scratch products: drop the tombstones post_delete wrote.
+                    ProdukTombstone.objects.filter(kode_barang__in=kode_barang_list).delete()
+                    Lokasi.objects.filter(kode_lokasi__in=kode_lokasi_list).delete()
+                    customer.delete()
+
+    def _run(self, options, kode_barang_list, customer_name, kode_lokasi_list):
+        self.stdout.write(
+            f"Running {options['processes']} process(es) x {options['threads']} thread(s) x "
+            f"{options['requests']} {'bulk(' + str(options['bulk']) + ')' if options['bulk'] else 'single'} checkout(s) "
+            f"over {len(kode_barang_list)} product(s) at {len(kode_lokasi_list) or 'the central'} location(s) "
+            f"on '{connections['default'].vendor}'"
+            f"{', group commit ' + format(options['group_commit_ms'], 'g') + ' ms' if options['group_commit_ms'] else ''}..."
+        )
+        # Child processes open their own connections.
+        connections.close_all()
+        worker_options = {key: options[key] for key in ('threads', 'requests', 'bulk', 'jumlah', 'seed', 'group_commit_ms')}
+
+        if options['processes'] <= 1:
+            return [_run_threads(worker_options, kode_barang_list, customer_name, kode_lokasi_list)]
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(options['processes']) as pool:
+            return pool.starmap(
+                _worker_process,
+                [(worker_options, kode_barang_list, customer_name, kode_lokasi_list)] * options['processes'],
+            )
+
+    def _report(self, options, results):
+        latencies = [value for result in results for value in result['latencies']]
+        begin_waits = [value for result in results for value in result['begin_waits']]
+        lock_waits = [value for result in results for value in result['lock_waits']]
+        outcomes = Counter()
+        for result in results:
+            outcomes.update(result['outcomes'])
+
+        duration = max(r['finished_at'] for r in results) - min(r['started_at'] for r in results)
+        total = sum(outcomes.values())
+        errors = total - outcomes['ok']
+
+        self.stdout.write(f"Requests:        {total} in {duration:.2f}s")
+        self.stdout.write(f"Throughput:      {total / duration:.1f} req/s, {outcomes['ok'] / duration:.1f} committed/s")
+        self.stdout.write(
+            f"Latency:         p50 {_percentile(latencies, 50) * 1000:.1f} ms, "
+            f"p95 {_percentile(latencies, 95) * 1000:.1f} ms, max {max(latencies, default=0) * 1000:.1f} ms"
+        )
+        if begin_waits:
+            self.stdout.write(
+                f"Write lock wait: mean {statistics.mean(begin_waits) * 1000:.2f} ms, "
+                f"p95 {_percentile(begin_waits, 95) * 1000:.2f} ms, max {max(begin_waits) * 1000:.2f} ms "
+                f"({len(begin_waits)} BEGIN IMMEDIATE)"
+            )
+        self.stdout.write(
+            f"Stock lock wait: mean {(statistics.mean(lock_waits) if lock_waits else 0) * 1000:.2f} ms, "
+            f"p95 {_percentile(lock_waits, 95) * 1000:.2f} ms, max {max(lock_waits, default=0) * 1000:.2f} ms "
+            f"({len(lock_waits)} locks)"
+        )
+        self.stdout.write(f"Error rate:      {errors / total * 100 if total else 0:.1f}% {dict(outcomes)}")
+
+        # Without group commit every request is its own transaction.
+        commits = sum(r['group_commits'] for r in results) if options['group_commit_ms'] else total
+        if options['group_commit_ms']:
+            self.stdout.write(f"Group commits:   {commits} ({total / commits if commits else 0:.1f} checkouts per commit)")
+
+        return {
+            'window': options['group_commit_ms'],
+            'committed_per_s': outcomes['ok'] / duration,
+            'per_commit': total / commits if commits else 0,
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'error_rate': errors / total * 100 if total else 0,
+        }
+
+    def _verify(self, options, kode_barang_list, kode_lokasi_list, results):
+        from produk.models import Produk, StokLokasi, Transaksi
+        from produk.stock import as_decimal
+
+        client_committed = defaultdict(Decimal)
+        for result in results:
+            for key, jumlah in result['committed'].items():
+                client_committed[key] += jumlah
+
+        # One stock row per (product, location); None is the central Produk.stok.
+        if kode_lokasi_list:
+            rows = [
+                ((row.produk_id, row.lokasi_id), row.stok)
+                for row in StokLokasi.objects.filter(produk__in=kode_barang_list, lokasi__in=kode_lokasi_list)
+            ]
+        else:
+            rows = [((produk.pk, None), produk.stok) for produk in Produk.objects.filter(kode_barang__in=kode_barang_list)]
+
+        failures = []
+        for (kode_barang, kode_lokasi), stok in sorted(rows, key=lambda row: (row[0][0], row[0][1] or '')):
+            label = f"{kode_barang}@{kode_lokasi}" if kode_lokasi else kode_barang
+            db_committed = sum(
+                (as_decimal(jumlah) for jumlah in Transaksi.objects.filter(
+                    produk=kode_barang, lokasi=kode_lokasi,
+                ).values_list('jumlah', flat=True)),
+                Decimal('0'),
+            )
+            expected = Decimal(options['stok']) - db_committed
+            stok = as_decimal(stok)
+            self.stdout.write(
+                f"{label}: start {options['stok']}, committed {db_committed} "
+                f"(clients saw {client_committed[(kode_barang, kode_lokasi)]}), final stok {stok}"
+            )
+            if stok != expected:
+                failures.append(f"{label}: stok {stok} != {options['stok']} - {db_committed}")
+            if stok < 0:
+                failures.append(f"{label}: oversold, stok {stok}")
+            if db_committed != client_committed[(kode_barang, kode_lokasi)]:
+                failures.append(
+                    f"{label}: {db_committed} committed in the database but clients got 201 for "
+                    f"{client_committed[(kode_barang, kode_lokasi)]}"
+                )
+
+        if failures:
+            raise CommandError("Stock invariant violated:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("No oversell: final stok equals starting stock minus committed transaksi."))
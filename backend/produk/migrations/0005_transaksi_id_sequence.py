@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:06
+
+import produk.models
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_transaksi_sequence(apps, schema_editor):
+    IdSequence = apps.get_model('produk', 'IdSequence')
+    Transaksi = apps.get_model('produk', 'Transaksi')
+    current = Transaksi.objects.aggregate(m=Max('id_transaksi'))['m'] or 0
+    IdSequence.objects.update_or_create(name='transaksi', defaults={'next_value': current + 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0004_remove_produk_harga_modal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='transaksi',
+            name='id_transaksi',
+            field=models.IntegerField(default=produk.models.get_next_transaksi_id, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(seed_transaksi_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:20
+
+import uuid
+
+import django.db.models.deletion
+from django.contrib.auth.hashers import make_password
+from django.db import migrations, models
+
+
+def link_customers(apps, schema_editor):
+    """
+    Points every transaksi at the User whose name matches the old free-text
+    customer. Names without an account get an inactive placeholder user so
+    no history is lost.
+    """
+    User = apps.get_model('user', 'User')
+    Transaksi = apps.get_model('produk', 'Transaksi')
+
+    names = set(
+        Transaksi.objects.exclude(customer__isnull=True)
+        .exclude(customer='')
+        .values_list('customer', flat=True)
+    )
+    user_ids = dict(User.objects.filter(name__in=names).values_list('name', 'id'))
+
+    for name in names - user_ids.keys():
+        placeholder = User.objects.create(
+            name=name,
+            email=f"{uuid.uuid4().hex}@customer.invalid",
+            password=make_password(None),
+            is_active=False,
+        )
+        user_ids[name] = placeholder.id
+
+    for name, user_id in user_ids.items():
+        Transaksi.objects.filter(customer=name).update(customer_ref_id=user_id)
+
+
+def unlink_customers(apps, schema_editor):
+    Transaksi = apps.get_model('produk', 'Transaksi')
+    User = apps.get_model('user', 'User')
+
+    for user_id, name in User.objects.filter(transaksi_ref__isnull=False).distinct().values_list('id', 'name'):
+        Transaksi.objects.filter(customer_ref_id=user_id).update(customer=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0005_transaksi_id_sequence'),
+        ('user', '0005_user_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaksi',
+            name='customer_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transaksi_ref', to='user.user'),
+        ),
+        migrations.RunPython(link_customers, unlink_customers),
+        migrations.RemoveField(
+            model_name='transaksi',
+            name='customer',
+        ),
+        migrations.RenameField(
+            model_name='transaksi',
+            old_name='customer_ref',
+            new_name='customer',
+        ),
+        migrations.AlterField(
+            model_name='transaksi',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transaksi', to='user.user'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['customer', '-waktu_transaksi'], name='transaksi_customer_waktu_idx'),
+        ),
+    ]
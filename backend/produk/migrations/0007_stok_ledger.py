@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def baseline_snapshots(apps, schema_editor):
+    """
+    The ledger starts now: record current stock as the first snapshot so
+    as_of queries have something to replay from.
+    """
+    Produk = apps.get_model('produk', 'Produk')
+    StokSnapshot = apps.get_model('produk', 'StokSnapshot')
+    now = timezone.now()
+    StokSnapshot.objects.bulk_create(
+        StokSnapshot(produk_id=kode_barang, stok=stok, waktu=now)
+        for kode_barang, stok in Produk.objects.values_list('kode_barang', 'stok')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0006_transaksi_customer_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StokMutasi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('perubahan', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('alasan', models.CharField(choices=[('awal', 'Stok awal'), ('penyesuaian', 'Penyesuaian (PUT/PATCH/bulk_update)'), ('penjualan', 'Penjualan (checkout)')], max_length=20)),
+                ('waktu', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mutasi_stok', to='produk.produk')),
+                ('transaksi', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mutasi_stok', to='produk.transaksi')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produk', 'waktu'], name='mutasi_produk_waktu_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StokSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stok', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('waktu', models.DateTimeField()),
+                ('produk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_stok', to='produk.produk')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('produk', 'waktu'), name='snapshot_produk_waktu_unique')],
+            },
+        ),
+        migrations.RunPython(baseline_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0007_stok_ledger'),
+        ('user', '0005_user_balance'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='produk',
+            name='stok',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['produk', 'waktu_transaksi'], name='transaksi_produk_waktu_idx'),
+        ),
+    ]
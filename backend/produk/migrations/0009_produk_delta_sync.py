@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0008_low_stock_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdukTombstone',
+            fields=[
+                ('kode_barang', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='produk',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='produk',
+            index=models.Index(fields=['updated_at', 'kode_barang'], name='produk_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produktombstone',
+            index=models.Index(fields=['deleted_at', 'kode_barang'], name='tombstone_deleted_idx'),
+        ),
+    ]
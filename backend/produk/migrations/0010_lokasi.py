@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0009_produk_delta_sync'),
+        ('user', '0005_user_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lokasi',
+            fields=[
+                ('kode_lokasi', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('nama_lokasi', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StokLokasi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stok', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='stokmutasi',
+            name='alasan',
+            field=models.CharField(choices=[('awal', 'Stok awal'), ('penyesuaian', 'Penyesuaian (PUT/PATCH/bulk_update)'), ('penjualan', 'Penjualan (checkout)'), ('transfer', 'Transfer antara stok pusat dan lokasi')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='stokmutasi',
+            name='lokasi',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mutasi_stok', to='produk.lokasi'),
+        ),
+        migrations.AddField(
+            model_name='transaksi',
+            name='lokasi',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transaksi', to='produk.lokasi'),
+        ),
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['lokasi', 'waktu_transaksi'], name='transaksi_lokasi_waktu_idx'),
+        ),
+        migrations.AddField(
+            model_name='stoklokasi',
+            name='lokasi',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stok_produk', to='produk.lokasi'),
+        ),
+        migrations.AddField(
+            model_name='stoklokasi',
+            name='produk',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stok_lokasi', to='produk.produk'),
+        ),
+        migrations.AddConstraint(
+            model_name='stoklokasi',
+            constraint=models.UniqueConstraint(fields=('produk', 'lokasi'), name='stoklokasi_produk_lokasi_unique'),
+        ),
+    ]
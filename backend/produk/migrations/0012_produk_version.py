@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0011_load_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produk',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0012_produk_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaksi',
+            index=models.Index(fields=['waktu_transaksi', 'produk', 'jumlah'], name='transaksi_waktu_produk_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 20:26
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produk', '0013_transaksi_waktu_produk_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaksi',
+            name='transaksi_waktu_produk_idx',
+        ),
+    ]
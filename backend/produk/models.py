@@ -10,22 +10,162 @@ def get_default_produk_pk():
     produk, created = Produk.objects.get_or_create(Produk.kode_barang)
     return produk.pk
 
+def get_next_transaksi_id():
+    from .sequences import transaksi_ids
+    return transaksi_ids.next()
+
 class Produk(models.Model):
     kode_barang = models.CharField(primary_key=True, max_length=20)
     nama_barang = models.CharField(max_length=100)
-    stok = models.PositiveIntegerField(default=0)
+    stok = models.PositiveIntegerField(default=0, db_index=True)
     satuan = models.CharField(max_length=20)
     harga_satuan = models.DecimalField(max_digits=12, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Dinaikkan oleh setiap penulisan; dasar ETag/If-Match (lihat produk.versioning)
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Keyset untuk GET /api/produk/changes/
+            models.Index(fields=['updated_at', 'kode_barang'], name='produk_updated_idx'),
+        ]
+
+class ProdukTombstone(models.Model):
+    """
+    Marks a deleted Produk so offline clients syncing through
+    /api/produk/changes/ learn that it is gone. Removed again if a product
+    with the same kode_barang is created.
+    """
+    kode_barang = models.CharField(primary_key=True, max_length=20)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'kode_barang'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kode_barang} (deleted {self.deleted_at})"
+
+class IdSequence(models.Model):
+    """
+    Server-side counters used by produk.sequences to hand out primary keys
+    in blocks, so clients never have to invent an id_transaksi.
+    """
+    name = models.CharField(primary_key=True, max_length=50)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} -> {self.next_value}"
+
+class Lokasi(models.Model):
+    """
+    A store or branch that sells from its own stock (StokLokasi), so
+    checkouts at different locations lock different rows. Produk.stok is the
+    central stock that has not been moved to any location.
+    """
+    kode_lokasi = models.CharField(primary_key=True, max_length=20)
+    nama_lokasi = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.kode_lokasi} - {self.nama_lokasi}"
+
+class StokLokasi(models.Model):
+    produk = models.ForeignKey(Produk, on_delete=models.CASCADE, related_name='stok_lokasi')
+    lokasi = models.ForeignKey(Lokasi, on_delete=models.PROTECT, related_name='stok_produk')
+    stok = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produk', 'lokasi'], name='stoklokasi_produk_lokasi_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.produk_id} @ {self.lokasi_id} = {self.stok}"
 
 class Transaksi(models.Model):
-    id_transaksi  = models.IntegerField(primary_key=True)
-    customer = models.CharField(max_length=100, blank=True, null=True)
+    id_transaksi  = models.IntegerField(primary_key=True, default=get_next_transaksi_id)
+    customer = models.ForeignKey(User, on_delete=models.PROTECT, related_name='transaksi', blank=True, null=True)
     produk = models.ForeignKey(Produk, on_delete=models.PROTECT, related_name='transaksi',)
+    lokasi = models.ForeignKey(Lokasi, on_delete=models.PROTECT, related_name='transaksi', blank=True, null=True)
     jumlah = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
     total_harga = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True) 
     waktu_transaksi = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Riwayat belanja per customer, terbaru dulu
+            models.Index(fields=['customer', '-waktu_transaksi'], name='transaksi_customer_waktu_idx'),
+            # Penjualan per produk dalam jendela waktu (laju penjualan)
+            models.Index(fields=['produk', 'waktu_transaksi'], name='transaksi_produk_waktu_idx'),
+            # Laporan penjualan per lokasi; dengan lokasi NULL: penjualan stok pusat dalam jendela waktu (low-stock)
+            models.Index(fields=['lokasi', 'waktu_transaksi'], name='transaksi_lokasi_waktu_idx'),
+        ]
+
+    def __str__(self):
+        user_name = self.customer.name if self.customer else "N/A"
+        return f"Transaksi {self.id_transaksi} by {user_name} for {self.produk.nama_barang}"
+
+class StokMutasi(models.Model):
+    """
+    Append-only stock ledger. Every change to Produk.stok or StokLokasi.stok
+    writes one row here in the same database transaction, with the signed
+    change in `perubahan`. `lokasi` is empty for the central stock.
+    """
+    ALASAN_CHOICES = [
+        ('awal', 'Stok awal'),
+        ('penyesuaian', 'Penyesuaian (PUT/PATCH/bulk_update)'),
+        ('penjualan', 'Penjualan (checkout)'),
+        ('transfer', 'Transfer antara stok pusat dan lokasi'),
+    ]
+
+    produk = models.ForeignKey(Produk, on_delete=models.CASCADE, related_name='mutasi_stok')
+    perubahan = models.DecimalField(max_digits=15, decimal_places=2)
+    alasan = models.CharField(max_length=20, choices=ALASAN_CHOICES)
+    transaksi = models.ForeignKey(Transaksi, on_delete=models.SET_NULL, related_name='mutasi_stok', blank=True, null=True)
+    lokasi = models.ForeignKey(Lokasi, on_delete=models.PROTECT, related_name='mutasi_stok', blank=True, null=True)
+    waktu = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['produk', 'waktu'], name='mutasi_produk_waktu_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.produk_id} {self.perubahan:+} ({self.alasan}) @ {self.waktu}"
+
+
+class StokSnapshot(models.Model):
+    """
+    Stock of one product at `waktu`, covering every StokMutasi up to and
+    including that moment. Written periodically by `manage.py snapshot_stok`.
+    """
+    produk = models.ForeignKey(Produk, on_delete=models.CASCADE, related_name='snapshot_stok')
+    stok = models.DecimalField(max_digits=15, decimal_places=2)
+    waktu = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['produk', 'waktu'], name='snapshot_produk_waktu_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.produk_id} = {self.stok} @ {self.waktu}"
+
+
+class LoadCheckpoint(models.Model):
+    """
+    How far `manage.py load_data` got through one input file. Updated in the
+    same transaction as each loaded chunk, so an interrupted load resumes
+    exactly after the last committed row.
+    """
+    source = models.CharField(primary_key=True, max_length=255)
+    file_size = models.BigIntegerField()
+    rows_done = models.BigIntegerField(default=0)
+    rows_rejected = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        user_name = self.user.get_full_name() or self.user.username if hasattr(self, 'customer') and self.customer else "N/A"
-        return f"Transaksi {self.id} by {user_name} for {self.produk.nama_barang}"
\ No newline at end of file
+        return f"{self.source} @ {self.rows_done}"
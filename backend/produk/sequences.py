@@ -0,0 +1,147 @@
+import os
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from backend.sqlite import write_atomic
+
+
+class BlockIdAllocator:
+    """
+    Hands out primary keys from an IdSequence row, reserving a whole block
+    per process so most ids cost no query at all.
+
+    A block is reserved with a single UPDATE ... next_value = next_value + n,
+    which takes the row (Postgres) or database (SQLite) write lock, so two
+    processes can never receive overlapping blocks. Ids within a process are
+    increasing and blocks are taken in time order, which keeps new rows
+    roughly time-ordered in the primary key index.
+
+    Outside an atomic block a whole block is reserved and committed on its
+    own. Inside one (e.g. the Transaksi.id_transaksi default in the admin)
+    only the missing ids are reserved, on the current connection: they
+    commit or roll back together with the rows that use them, so a rolled
+    back transaction never leaves this process holding ids that another
+    process may be handed again. A second connection is never opened, as it
+    would wait on the write lock the outer transaction may already hold (on
+    SQLite, from the start of every backend.sqlite.write_atomic() block).
+    Reserving ids (next()/allocate()/prefetch()) before opening the write
+    transaction keeps that transaction free of the sequence UPDATE.
+    """
+
+    def __init__(self, name, model_label, pk_field, block_size=100, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.model_label = model_label
+        self.pk_field = pk_field
+        self.block_size = block_size
+        self.using = using
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._next = 0
+        self._end = 0
+
+    def next(self):
+        return self.allocate(1)[0]
+
+    def allocate(self, count):
+        """
+        Returns a list of `count` fresh ids, reserving at most one new block.
+        """
+        if count <= 0:
+            return []
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: never reuse the parent's block.
+                self._reset()
+
+            ids = list(range(self._next, min(self._end, self._next + count)))
+            self._next += len(ids)
+
+            missing = count - len(ids)
+            if missing and connections[self.using].in_atomic_block:
+                start = self._reserve(missing)
+                ids.extend(range(start, start + missing))
+            elif missing:
+                block = max(self.block_size, missing)
+                start = self._reserve(block)
+                ids.extend(range(start, start + missing))
+                self._next = start + missing
+                self._end = start + block
+
+        return ids
+
+    def prefetch(self, count):
+        """
+        Makes sure this process holds at least `count` unused ids, so that a
+        following transaction can allocate them without touching the
+        sequence table. Call it before opening the write transaction; inside
+        one it does nothing.
+        """
+        if connections[self.using].in_atomic_block:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._end - self._next < count:
+                block = max(self.block_size, count)
+                self._next = self._reserve(block)
+                self._end = self._next + block
+
+    def skip_past(self, value):
+        """
+        Makes sure no block handed out from now on contains `value` or
+        anything below it, for rows inserted with explicit ids (historical
+        imports). This process's own unused block is dropped if it overlaps.
+        Call it before opening the write transaction, like allocate().
+        """
+        with self._lock:
+            if self._pid != os.getpid() or self._next <= value:
+                self._reset()
+            needed = self._reserve(0)
+            if needed <= value:
+                self._reserve(value + 1 - needed)
+
+    def _reserve(self, size):
+        # Joins the caller's transaction when there is one (see the class docstring).
+        connection = connections[self.using]
+        with write_atomic(using=self.using):
+            return self._bump(connection, size)
+
+    def _bump(self, connection, size):
+        table = connection.ops.quote_name(apps.get_model('produk', 'IdSequence')._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                [size, self.name],
+            )
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                    [self.name, self._initial_value(connection) + size],
+                )
+            cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [self.name])
+            end = cursor.fetchone()[0]
+        return end - size
+
+    def _initial_value(self, connection):
+        model = apps.get_model(self.model_label)
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(model._meta.get_field(self.pk_field).column)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MAX({column}) FROM {table}")
+            current = cursor.fetchone()[0]
+        return (current or 0) + 1
+
+
+transaksi_ids = BlockIdAllocator(
+    'transaksi',
+    'produk.Transaksi',
+    'id_transaksi',
+    block_size=settings.TRANSAKSI_ID_BLOCK_SIZE,
+)
@@ -1,26 +1,138 @@
+import math
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Produk, Transaksi # Import model Produk dan Transaksi
+from rest_framework.validators import UniqueValidator
+from backend.serializers import BulkListSerializer, PrefetchedSlugRelatedField
+from backend.sqlite import write_atomic
+from .catalog import get_produk_map, invalidate_produk
+from .models import Lokasi, Produk, StokLokasi, Transaksi # Import model Produk dan Transaksi
+from .stock import as_decimal, record_movement
+from .versioning import VersionConflict
 from user.models import User # Import User model
 
+class ProdukListSerializer(BulkListSerializer):
+    """
+    Bulk create: checks every kode_barang against the database in one query
+    (and against the rest of the payload) instead of one UniqueValidator
+    query per item.
+    """
+
+    def prefetch(self, data):
+        field = self.child.fields['kode_barang']
+        unique = [validator for validator in field.validators if isinstance(validator, UniqueValidator)]
+        field.validators = [validator for validator in field.validators if validator not in unique]
+        self.unique_message = unique[0].message if unique else UniqueValidator.message
+        self.seen = set()
+        existing = Produk.objects.filter(kode_barang__in=self.collect(data, 'kode_barang'))
+        return {'kode_barang': set(existing.values_list('kode_barang', flat=True))}
+
+    def validate_item(self, attrs):
+        kode_barang = attrs['kode_barang']
+        if kode_barang in self.child.prefetched['kode_barang'] or kode_barang in self.seen:
+            raise serializers.ValidationError({'kode_barang': [self.unique_message]}, code='unique')
+        self.seen.add(kode_barang)
+        return attrs
+
 class ProdukSerializer(serializers.ModelSerializer):
     class Meta:
         model = Produk
         fields = '__all__'
+        list_serializer_class = ProdukListSerializer
+
+    def create(self, validated_data):
+        validated_data.pop('version', None)  # Always starts at 1
+        with write_atomic():
+            produk = super().create(validated_data)
+            if produk.stok:
+                record_movement(produk, produk.stok, 'awal')
+        return produk
+
+    def update(self, instance, validated_data):
+        """
+        Conditional update: writes only while the row is still at
+        instance.version (or at the `version` the client sent) and bumps it,
+        else raises VersionConflict. No row lock is held, and overwriting
+        'stok' is recorded in the ledger as the difference from the stock at
+        that version.
+        """
+        expected = validated_data.pop('version', instance.version)
+        if validated_data.get('kode_barang', instance.pk) != instance.pk:
+            raise serializers.ValidationError({'kode_barang': ["kode_barang tidak dapat diubah."]})
+        validated_data.pop('kode_barang', None)
+
+        values = dict(validated_data, version=F('version') + 1, updated_at=timezone.now())
+        with write_atomic():
+            updated = Produk.objects.filter(pk=instance.pk, version=expected).update(**values)
+            if not updated:
+                current = Produk.objects.filter(pk=instance.pk).values_list('version', flat=True).first()
+                raise VersionConflict(current)
+            if 'stok' in validated_data and as_decimal(validated_data['stok']) != as_decimal(instance.stok):
+                record_movement(instance, as_decimal(validated_data['stok']) - as_decimal(instance.stok), 'penyesuaian')
+
+        # update() sends no post_save, so the catalog cache is cleared here.
+        invalidate_produk([instance.pk])
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.version = expected + 1
+        instance.updated_at = values['updated_at']
+        return instance
+
+class TransaksiListSerializer(BulkListSerializer):
+    """
+    Bulk checkout: resolves every produk, customer and lokasi named in the
+    payload with one query each, so validating N lines costs three queries
+    (two when the produk all come from the shared catalog).
+    """
+
+    def prefetch(self, data):
+        return {
+            'produk': get_produk_map(self.collect(data, 'produk')),
+            'customer': User.objects.in_bulk(self.collect(data, 'customer'), field_name='name'),
+            'lokasi': Lokasi.objects.in_bulk(self.collect(data, 'lokasi')),
+        }
+
+class CatalogProdukField(PrefetchedSlugRelatedField):
+    """
+    Resolves a single kode_barang through produk.catalog.get_produk_map, so
+    it comes from the shared catalog when that is on.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = getattr(self.parent, 'prefetched', {}).get(self.field_name)
+        if prefetched is not None or not settings.PRODUK_SHARED_CATALOG or not isinstance(data, str):
+            return super().to_internal_value(data)
+        produk = get_produk_map([data]).get(data)
+        if produk is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return produk
 
 class TransaksiSerializer(serializers.ModelSerializer):
     """
     Serializer for the Transaksi model.
-    Accepts 'customer' as a string (name) and 'produk' by its 'kode_barang'.
+    Accepts 'customer' by the user's name and 'produk' by its 'kode_barang'.
     """
-    # This field now accepts the customer's name as a string, matching your model.
-    customer = serializers.CharField(max_length=100)
+    # The customer is a User, looked up (and rendered) by its unique name.
+    customer = PrefetchedSlugRelatedField(
+        queryset=User.objects.all(),
+        slug_field='name'
+    )
 
     # This correctly uses the product's 'kode_barang' for input.
-    produk = serializers.SlugRelatedField(
+    produk = CatalogProdukField(
         queryset=Produk.objects.all(),
         slug_field='kode_barang'
     )
 
+    # Optional selling location. Without one the sale draws on the central Produk.stok.
+    lokasi = PrefetchedSlugRelatedField(
+        queryset=Lokasi.objects.all(),
+        slug_field='kode_lokasi',
+        required=False,
+        allow_null=True,
+    )
+
     # These are read-only fields for providing detailed output in the API response.
     total_harga = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     produk_name = serializers.CharField(source='produk.nama_barang', read_only=True)
@@ -30,15 +142,17 @@ class TransaksiSerializer(serializers.ModelSerializer):
         model = Transaksi
         fields = [
             'id_transaksi',
-            'customer', # This now directly holds the customer name string.
+            'customer', # The customer's name (User.name).
             'produk',
             'produk_name',
+            'lokasi',
             'jumlah',
             'total_harga',
             'waktu_transaksi',
             'kode_barang'
         ]
         read_only_fields = ['id_transaksi', 'total_harga', 'produk_name', 'kode_barang']
+        list_serializer_class = TransaksiListSerializer
 
     def validate(self, data):
         """
@@ -47,7 +161,170 @@ class TransaksiSerializer(serializers.ModelSerializer):
         produk = data['produk']
         jumlah = data['jumlah']
 
-        if float(produk.stok) < float(jumlah):
-            raise serializers.ValidationError(f"Stok tidak cukup untuk {produk.nama_barang}. Tersedia: {produk.stok}")
+        # Location stock is only checked under its row lock at checkout, and so
+        # is the central stock when all we have is the shared catalog's hint.
+        if data.get('lokasi') is None and not getattr(produk, 'stok_is_hint', False) and as_decimal(produk.stok) < jumlah:
+            raise serializers.ValidationError(f"Stok tidak cukup untuk {produk.nama_barang}. Tersedia: {produk.stok}", code='out_of_stock')
+
+        return data
+
+class TransaksiImportListSerializer(TransaksiListSerializer):
+    """
+    Historical import: also checks every explicit id_transaksi against the
+    database in one query (and against the rest of the payload).
+    """
+
+    def prefetch(self, data):
+        prefetched = super().prefetch(data)
+        field = self.child.fields['id_transaksi']
+        unique = [validator for validator in field.validators if isinstance(validator, UniqueValidator)]
+        field.validators = [validator for validator in field.validators if validator not in unique]
+        self.unique_message = unique[0].message if unique else UniqueValidator.message
+        self.seen = set()
+        ids = set()
+        for item in data:
+            value = item.get('id_transaksi') if isinstance(item, dict) else None
+            if isinstance(value, (int, str)) and str(value).strip().isdigit():
+                ids.add(int(value))
+        prefetched['id_transaksi'] = set(Transaksi.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        return prefetched
+
+    def validate_item(self, attrs):
+        id_transaksi = attrs.get('id_transaksi')
+        if id_transaksi is not None:
+            if id_transaksi in self.child.prefetched['id_transaksi'] or id_transaksi in self.seen:
+                raise serializers.ValidationError({'id_transaksi': [self.unique_message]}, code='unique')
+            self.seen.add(id_transaksi)
+        return attrs
+
+class TransaksiImportSerializer(TransaksiSerializer):
+    """
+    A past sale loaded by `manage.py load_data`. id_transaksi and
+    total_harga may be given (otherwise they are assigned as at checkout).
+    Stock is checked by the loader under the row locks, in file order, so
+    validate() does not check it against the stock read here.
+    """
+    total_harga = serializers.DecimalField(max_digits=15, decimal_places=2, required=False, allow_null=True)
+
+    class Meta(TransaksiSerializer.Meta):
+        read_only_fields = ['produk_name', 'kode_barang']
+        extra_kwargs = {'jumlah': {'required': True, 'allow_null': False, 'min_value': 0}}
+        list_serializer_class = TransaksiImportListSerializer
+
+    def validate(self, data):
+        return data
+
+class LokasiSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lokasi
+        fields = '__all__'
+
+
+class StokLokasiSerializer(serializers.ModelSerializer):
+    produk = serializers.SlugRelatedField(read_only=True, slug_field='kode_barang')
+    nama_barang = serializers.CharField(source='produk.nama_barang', read_only=True)
+    lokasi = serializers.SlugRelatedField(read_only=True, slug_field='kode_lokasi')
+
+    class Meta:
+        model = StokLokasi
+        fields = ['produk', 'nama_barang', 'lokasi', 'stok']
+
+
+class TransferStokSerializer(serializers.Serializer):
+    """
+    Moves stock from the central Produk.stok to a location; a negative
+    jumlah moves it back.
+    """
+    produk = serializers.SlugRelatedField(queryset=Produk.objects.all(), slug_field='kode_barang')
+    jumlah = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+
+class QuoteItemSerializer(serializers.Serializer):
+    """
+    One cart line for the quote endpoint: a product code and a quantity.
+    """
+    kode_barang = serializers.CharField(max_length=20)
+    jumlah = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0)
+
+
+class QuoteLineSerializer(serializers.Serializer):
+    """
+    Read-only representation of a priced cart line. Lines for unknown
+    products only carry 'kode_barang', 'jumlah' and 'error'.
+    """
+    kode_barang = serializers.CharField(read_only=True)
+    nama_barang = serializers.CharField(read_only=True)
+    satuan = serializers.CharField(read_only=True)
+    jumlah = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    harga_satuan = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    total_harga = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    stok = serializers.IntegerField(read_only=True)
+    stok_cukup = serializers.BooleanField(read_only=True)
+    error = serializers.CharField(read_only=True)
+
+
+class StokAsOfSerializer(serializers.Serializer):
+    """
+    Stock of a product at a point in time, as rebuilt from the ledger.
+    """
+    kode_barang = serializers.CharField(read_only=True)
+    nama_barang = serializers.CharField(read_only=True)
+    satuan = serializers.CharField(read_only=True)
+    stok = serializers.DecimalField(source='stok_as_of', max_digits=15, decimal_places=2, read_only=True)
+
+
+class LowStockSerializer(serializers.ModelSerializer):
+    """
+    Product flagged by the low-stock report, with its sales velocity over
+    the window, days of cover left and a suggested reorder quantity that
+    brings it back to `target_days` of cover. Needs 'window_days' and
+    'target_days' in the context.
+    """
+    terjual = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    laju_harian = serializers.SerializerMethodField()
+    hari_tersisa = serializers.SerializerMethodField()
+    saran_pesan = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Produk
+        fields = ['kode_barang', 'nama_barang', 'satuan', 'stok', 'terjual', 'laju_harian', 'hari_tersisa', 'saran_pesan']
+
+    def _velocity(self, obj):
+        return as_decimal(obj.terjual) / self.context['window_days']
+
+    def get_laju_harian(self, obj):
+        return f"{self._velocity(obj):.2f}"
+
+    def get_hari_tersisa(self, obj):
+        velocity = self._velocity(obj)
+        if not velocity:
+            return None
+        return f"{as_decimal(obj.stok) / velocity:.1f}"
+
+    def get_saran_pesan(self, obj):
+        needed = self._velocity(obj) * self.context['target_days'] - as_decimal(obj.stok)
+        return max(math.ceil(needed), 0)
+
+
+class BatchSubRequestSerializer(serializers.Serializer):
+    """
+    One call inside POST /api/batch/. 'path' may carry a query string.
+    """
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField(max_length=500)
+    body = serializers.JSONField(required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = {**data, 'method': data['method'].upper()}
+        return super().to_internal_value(data)
+
+
+class BatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(default=False)
+    requests = BatchSubRequestSerializer(many=True, allow_empty=False)
 
-        return data
\ No newline at end of file
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests.")
+        return value
@@ -0,0 +1,373 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import Produk
+
+# Snapshot katalog yang dibagi semua worker lewat satu file memory-mapped
+# (settings.PRODUK_SHARED_CATALOG_PATH). Worker membaca harga, nama, satuan dan
+# petunjuk stok langsung dari halaman file yang sama tanpa query database.
+#
+# Isi file:
+#   header   magic, superseded, seq, built_at, count, capacity, offset records, offset strings
+#   slots    `capacity` x u32: indeks record + 1 (0 = kosong), hash crc32(kode_barang), linear probing
+#   records  `count` x RECORD, urutan kode_barang
+#   strings  kode_barang, nama_barang dan satuan dalam UTF-8
+#
+# Setelah commit yang mengubah produk (produk.catalog.invalidate_produk), harga,
+# stok, updated_at dan version ditulis ulang di tempat di bawah seqlock (`seq`
+# ganjil selama penulisan). Perubahan yang hanya menyentuh stok (checkout)
+# dikumpulkan per proses dan di-patch sekaligus oleh thread latar belakang
+# setiap PRODUK_SHARED_CATALOG_PATCH_INTERVAL_MS. Produk baru atau nama/satuan yang berubah membuat
+# file baru yang menggantikan file lama lewat os.replace; file lama ditandai
+# `superseded` sehingga pembaca membuka ulang. Stok di sini hanya petunjuk:
+# pemeriksaan stok yang menentukan tetap dilakukan di database di bawah lock.
+#
+# Pembaca tidak pernah membangun ulang file di dalam request. File yang hilang,
+# kedaluwarsa (PRODUK_SHARED_CATALOG_MAX_AGE) atau `seq`-nya tertinggal ganjil
+# karena penulis mati di tengah patch dibangun ulang oleh thread latar belakang,
+# dan hanya worker yang berhasil mengambil flock tanpa menunggu yang mengerjakannya.
+# Selama itu request memakai file lama, atau membaca dari database.
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PKC1'
+HEADER = struct.Struct('<4sIQdIIII')
+SUPERSEDED = struct.Struct('<I')
+SUPERSEDED_OFFSET = 4
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = 8
+SLOT = struct.Struct('<I')
+# kode_barang, nama_barang, satuan (offset, panjang), lalu bagian yang bisa di-patch
+RECORD = struct.Struct('<IHIHIHqqqI')
+# harga_satuan (sen), stok (per seratus), updated_at (mikrodetik sejak epoch), version (0 = dihapus)
+VALUES = struct.Struct('<qqqI')
+VALUES_OFFSET = RECORD.size - VALUES.size
+# Pembacaan yang bertabrakan dengan patch diulang paling banyak sekian kali.
+READ_RETRIES = 100
+# Jeda minimum (detik) antar percobaan refresh latar belakang dari satu proses.
+REFRESH_INTERVAL = 1.0
+
+# In Produk's field order, as Produk.from_db expects for a full row.
+FIELDS = ['kode_barang', 'nama_barang', 'stok', 'satuan', 'harga_satuan', 'updated_at', 'version']
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _hundredths(value):
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def _values(row):
+    _, _, stok, _, harga_satuan, updated_at, version = row
+    return _hundredths(harga_satuan), _hundredths(stok), (updated_at - EPOCH) // timedelta(microseconds=1), version
+
+
+def encode(rows):
+    """
+    Builds the file contents for `rows`, tuples of FIELDS values as returned
+    by values_list(*FIELDS).
+    """
+    capacity = 8
+    while capacity < 2 * len(rows):
+        capacity *= 2
+    slots = [0] * capacity
+    records = bytearray()
+    strings = bytearray()
+
+    def add_string(value):
+        encoded = value.encode()
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    for index, row in enumerate(rows):
+        key_offset, key_length = add_string(row[0])
+        records += RECORD.pack(key_offset, key_length, *add_string(row[1]), *add_string(row[3]), *_values(row))
+        slot = zlib.crc32(row[0].encode()) & (capacity - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (capacity - 1)
+        slots[slot] = index + 1
+
+    records_offset = HEADER.size + capacity * SLOT.size
+    header = HEADER.pack(MAGIC, 0, 0, time.time(), len(rows), capacity, records_offset, records_offset + len(records))
+    return header + struct.pack(f'<{capacity}I', *slots) + records + strings
+
+
+class SharedCatalog:
+    """
+    Per-process handle on the shared catalog file. get_many() reads the
+    mapping without locks or queries; patch() and rebuild() serialize on an
+    flock next to the file, so any worker can publish changes. A missing,
+    expired or torn file is refreshed in the background, never by a request,
+    and stock-only changes queued by patch_later() are patched there too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._view = None
+        self._pid = None
+        self._refresher = None
+        self._refresh_after = 0.0
+        self._dirty = set()
+        self._patcher = None
+
+    @property
+    def path(self):
+        return str(settings.PRODUK_SHARED_CATALOG_PATH)
+
+    def get_many(self, kode_barang_list):
+        """
+        Returns {kode_barang: Produk} for every listed produk in the snapshot.
+        The instances carry stok_is_hint = True: their stock may trail the
+        database and must not decide a sale. Returns nothing, so the caller
+        reads the database, while there is no usable snapshot.
+        """
+        view = self._current()
+        if view is None:
+            return {}
+        _, _, _, _, _, capacity, records_offset, strings_offset = HEADER.unpack_from(view)
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(view, SEQ_OFFSET)[0]
+            if seq & 1:
+                time.sleep(0)  # A patch is being written
+                continue
+            found = {}
+            for kode_barang in kode_barang_list:
+                row = self._read(view, capacity, records_offset, strings_offset, kode_barang)
+                if row is not None:
+                    found[kode_barang] = row
+            if SEQ.unpack_from(view, SEQ_OFFSET)[0] == seq:
+                break
+        else:
+            # Either the writer died mid-patch and left seq odd, or patches keep
+            # landing: the refresh tells the two apart under the flock.
+            self._refresh_in_background()
+            return {}
+
+        produk_map = {}
+        for kode_barang, (nama_barang, satuan, harga, stok, updated_at, version) in found.items():
+            produk = Produk.from_db(DEFAULT_DB_ALIAS, FIELDS, [
+                kode_barang,
+                nama_barang,
+                stok // 100 if stok % 100 == 0 else Decimal(stok).scaleb(-2),
+                satuan,
+                Decimal(harga).scaleb(-2),
+                EPOCH + timedelta(microseconds=updated_at),
+                version,
+            ])
+            produk.stok_is_hint = True
+            produk_map[kode_barang] = produk
+        return produk_map
+
+    def patch(self, kode_barang_list):
+        """
+        Brings the listed produk up to date from the database. Price, stock,
+        updated_at and version are rewritten in place; a deleted produk is
+        marked as such. A new produk, or a changed name or unit, rebuilds
+        the file instead.
+        """
+        with self._file_lock():
+            rows = {row[0]: row for row in Produk.objects.filter(kode_barang__in=kode_barang_list).values_list(*FIELDS)}
+            try:
+                handle = open(self.path, 'r+b')
+            except FileNotFoundError:
+                self._rebuild_locked()
+                return
+            with handle, mmap.mmap(handle.fileno(), 0) as view:
+                _, _, seq, _, _, capacity, records_offset, strings_offset = HEADER.unpack_from(view)
+                # An odd seq under the flock was left by a writer that died mid-patch.
+                if not seq & 1:
+                    updates = []
+                    for kode_barang in kode_barang_list:
+                        index = self._find(view, capacity, records_offset, strings_offset, kode_barang.encode())
+                        row = rows.get(kode_barang)
+                        if index is None:
+                            if row is None:
+                                continue
+                            break
+                        if row is None:
+                            updates.append((index, (0, 0, 0, 0)))
+                            continue
+                        offset = records_offset + index * RECORD.size
+                        _, _, name_offset, name_length, satuan_offset, satuan_length = RECORD.unpack_from(view, offset)[:6]
+                        if (self._string(view, strings_offset, name_offset, name_length) != row[1]
+                                or self._string(view, strings_offset, satuan_offset, satuan_length) != row[3]):
+                            break
+                        updates.append((index, _values(row)))
+                    else:
+                        SEQ.pack_into(view, SEQ_OFFSET, seq + 1)
+                        for index, values in updates:
+                            VALUES.pack_into(view, records_offset + index * RECORD.size + VALUES_OFFSET, *values)
+                        SEQ.pack_into(view, SEQ_OFFSET, seq + 2)
+                        return
+            self._rebuild_locked()
+
+    def patch_later(self, kode_barang_list):
+        """
+        Queues a change that only moved stock. This process patches every
+        queued produk in one patch() per PRODUK_SHARED_CATALOG_PATCH_INTERVAL_MS,
+        off the request path; until then the snapshot keeps the previous
+        stock hint.
+        """
+        with self._lock:
+            self._dirty.update(kode_barang_list)
+            if self._patcher is None or not self._patcher.is_alive():
+                # Also after a fork, which leaves the parent's thread behind.
+                self._patcher = threading.Thread(target=self._patch_queued, name='produk-shared-catalog-patch', daemon=True)
+                self._patcher.start()
+
+    def _patch_queued(self):
+        while True:
+            time.sleep(settings.PRODUK_SHARED_CATALOG_PATCH_INTERVAL_MS / 1000)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                continue
+            try:
+                self.patch(sorted(dirty))
+            except Exception:
+                logger.exception("Patching the shared produk catalog failed")
+                with self._lock:
+                    self._dirty |= dirty  # Retried on the next round
+            finally:
+                connections.close_all()
+
+    def rebuild(self):
+        """Publishes a fresh snapshot of the whole catalog."""
+        with self._file_lock():
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        data = encode(list(Produk.objects.order_by('kode_barang').values_list(*FIELDS)))
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as handle:
+            handle.write(data)
+        try:
+            previous = open(self.path, 'r+b')
+        except FileNotFoundError:
+            previous = None
+        os.replace(temporary, self.path)
+        if previous is not None:
+            # Readers still mapping the old file reopen when they see this.
+            with previous:
+                os.pwrite(previous.fileno(), SUPERSEDED.pack(1), SUPERSEDED_OFFSET)
+
+    def _current(self):
+        """
+        This process's mapping of the current file, reopened when superseded,
+        or None while there is no file. Never rebuilds: a missing or expired
+        file is handed to _refresh_in_background().
+        """
+        view = self._view
+        if view is None or self._pid != os.getpid() or self._superseded(view):
+            with self._lock:
+                view = self._view
+                if view is None or self._pid != os.getpid() or self._superseded(view):
+                    # The old mapping is left to the garbage collector: other threads may still be reading it.
+                    view = self._map()
+                    self._view, self._pid = view, os.getpid()
+        if view is None or self._expired(view):
+            self._refresh_in_background()
+        return view
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            if time.monotonic() < self._refresh_after:
+                return
+            self._refresh_after = time.monotonic() + REFRESH_INTERVAL
+            self._refresher = threading.Thread(target=self._refresh, name='produk-shared-catalog', daemon=True)
+            self._refresher.start()
+
+    def _refresh(self):
+        """Rebuilds a missing, expired or torn file, unless another worker holds the flock."""
+        try:
+            with self._file_lock(blocking=False) as locked:
+                if not locked:
+                    return
+                view = self._map()
+                try:
+                    # Holding the flock, no patch is in progress: an odd seq is a dead writer's.
+                    if view is None or self._expired(view) or SEQ.unpack_from(view, SEQ_OFFSET)[0] & 1:
+                        self._rebuild_locked()
+                finally:
+                    if view is not None:
+                        view.close()
+        except Exception:
+            logger.exception("Refreshing the shared produk catalog failed")
+        finally:
+            connections.close_all()
+
+    def _map(self):
+        try:
+            with open(self.path, 'rb') as handle:
+                view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        return view if view[:len(MAGIC)] == MAGIC else None
+
+    def _superseded(self, view):
+        return SUPERSEDED.unpack_from(view, SUPERSEDED_OFFSET)[0] == 1
+
+    def _expired(self, view):
+        built_at = HEADER.unpack_from(view)[3]
+        return time.time() - built_at > settings.PRODUK_SHARED_CATALOG_MAX_AGE
+
+    @contextmanager
+    def _file_lock(self, blocking=True):
+        """Holds the flock next to the file; yields False if not blocking and it is taken."""
+        import fcntl  # POSIX only, like the shared catalog itself
+        with open(f'{self.path}.lock', 'a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _find(self, view, capacity, records_offset, strings_offset, key):
+        slot = zlib.crc32(key) & (capacity - 1)
+        while True:
+            index = SLOT.unpack_from(view, HEADER.size + slot * SLOT.size)[0]
+            if not index:
+                return None
+            key_offset, key_length = struct.unpack_from('<IH', view, records_offset + (index - 1) * RECORD.size)
+            start = strings_offset + key_offset
+            if key_length == len(key) and view[start:start + key_length] == key:
+                return index - 1
+            slot = (slot + 1) & (capacity - 1)
+
+    def _read(self, view, capacity, records_offset, strings_offset, kode_barang):
+        index = self._find(view, capacity, records_offset, strings_offset, kode_barang.encode())
+        if index is None:
+            return None
+        _, _, name_offset, name_length, satuan_offset, satuan_length, harga, stok, updated_at, version = \
+            RECORD.unpack_from(view, records_offset + index * RECORD.size)
+        if not version:
+            return None
+        return (
+            self._string(view, strings_offset, name_offset, name_length),
+            self._string(view, strings_offset, satuan_offset, satuan_length),
+            harga, stok, updated_at, version,
+        )
+
+    def _string(self, view, strings_offset, offset, length):
+        start = strings_offset + offset
+        return view[start:start + length].decode()
+
+
+shared_catalog = SharedCatalog()
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.conf import settings
+from django.utils import timezone
+
+from backend import metrics
+from backend.sqlite import write_lock_acquired
+from .catalog import invalidate_produk
+from .models import Produk, ProdukTombstone
+
+# Sent by TransaksiViewSet after a checkout has locked and decremented a
+# stock row. Arguments: produk (kode_barang), lokasi (kode_lokasi, or None
+# for the central Produk.stok) and wait (seconds).
+stock_lock_acquired = Signal()
+
+STOCK_FIELDS = {'stok', 'updated_at', 'version'}
+
+
+@receiver(stock_lock_acquired)
+def observe_stock_lock_wait(sender, wait, lokasi=None, **kwargs):
+    if settings.METRICS_ENABLED:
+        metrics.stock_lock_wait.observe(wait, stock='pusat' if lokasi is None else 'lokasi')
+
+
+# Under the SQLite profile a checkout waits for the write lock at BEGIN,
+# before stock_lock_acquired starts timing: that wait is observed here.
+@receiver(write_lock_acquired)
+def observe_write_lock_wait(sender, wait, **kwargs):
+    if settings.METRICS_ENABLED:
+        metrics.write_lock_wait.observe(wait)
+
+
+# Keep the catalog cache from serving prices or stock that were just changed.
+@receiver(post_save, sender=Produk)
+@receiver(post_delete, sender=Produk)
+def invalidate_catalog_cache(sender, instance, update_fields=None, **kwargs):
+    # A checkout saves only these fields (TransaksiViewSet._take_stock).
+    stock_only = update_fields is not None and set(update_fields) <= STOCK_FIELDS
+    invalidate_produk([instance.pk], stock_only=stock_only)
+
+
+# Tombstones let /api/produk/changes/ report deletions to offline clients.
+@receiver(post_delete, sender=Produk)
+def record_tombstone(sender, instance, **kwargs):
+    ProdukTombstone.objects.update_or_create(kode_barang=instance.pk, defaults={'deleted_at': timezone.now()})
+
+
+@receiver(post_save, sender=Produk)
+def clear_tombstone(sender, instance, created, **kwargs):
+    if created:
+        ProdukTombstone.objects.filter(kode_barang=instance.pk).delete()
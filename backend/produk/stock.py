@@ -0,0 +1,224 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import invalidate_produk
+from .models import Produk, StokLokasi, StokMutasi, StokSnapshot, Transaksi
+
+# Stands in for "no snapshot yet": replay the ledger from the beginning.
+LEDGER_EPOCH = datetime.datetime(1900, 1, 1, tzinfo=datetime.timezone.utc)
+
+STOK_FIELD = DecimalField(max_digits=15, decimal_places=2)
+
+
+def as_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def record_movement(produk, perubahan, alasan, transaksi=None, lokasi=None):
+    """
+    Appends one ledger row. Call it inside the transaction that changes
+    Produk.stok (or StokLokasi.stok for `lokasi`) so the ledger and the stock
+    column commit together.
+    """
+    return StokMutasi.objects.create(
+        produk=produk,
+        perubahan=as_decimal(perubahan),
+        alasan=alasan,
+        transaksi=transaksi,
+        lokasi=lokasi,
+    )
+
+
+def lock_produk(kode_barang_list):
+    """
+    Loads and row-locks the given products in primary-key order, so two
+    requests touching overlapping products always lock them in the same order
+    and cannot deadlock. Returns {kode_barang: Produk}.
+    """
+    queryset = Produk.objects.select_for_update().filter(kode_barang__in=kode_barang_list).order_by('kode_barang')
+    return {produk.kode_barang: produk for produk in queryset}
+
+
+def apply_stock_deltas(deltas):
+    """
+    Adds deltas[kode_barang] to each product's stock in a single UPDATE and
+    bumps updated_at (update() skips auto_now) and version. Call it after lock_produk in
+    the same transaction, together with the matching ledger rows.
+    """
+    deltas = {kode_barang: as_decimal(delta) for kode_barang, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    updated = Produk.objects.filter(kode_barang__in=deltas).update(
+        stok=Case(
+            *[When(kode_barang=kode_barang, then=F('stok') + Value(delta, output_field=STOK_FIELD))
+              for kode_barang, delta in deltas.items()],
+            default=F('stok'),
+            output_field=STOK_FIELD,
+        ),
+        updated_at=timezone.now(),
+        version=F('version') + 1,
+    )
+    # update() sends no post_save, so the catalog cache is cleared here.
+    invalidate_produk(list(deltas), stock_only=True)
+    return updated
+
+
+def _stok_lokasi_filter(pairs):
+    condition = Q(pk__in=[])
+    for kode_barang, kode_lokasi in pairs:
+        condition |= Q(produk_id=kode_barang, lokasi_id=kode_lokasi)
+    return condition
+
+
+def lock_stok_lokasi(pairs):
+    """
+    lock_produk for location stock: loads and row-locks the StokLokasi rows
+    of the given (kode_barang, kode_lokasi) pairs in key order. Returns
+    {(kode_barang, kode_lokasi): StokLokasi}; pairs without a row are missing.
+    """
+    queryset = StokLokasi.objects.select_for_update().filter(
+        _stok_lokasi_filter(pairs)
+    ).order_by('produk_id', 'lokasi_id')
+    return {(row.produk_id, row.lokasi_id): row for row in queryset}
+
+
+def apply_lokasi_deltas(deltas):
+    """
+    apply_stock_deltas for location stock, keyed by (kode_barang, kode_lokasi).
+    Produk rows are not touched, so other locations are never blocked.
+    """
+    deltas = {pair: as_decimal(delta) for pair, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return StokLokasi.objects.filter(_stok_lokasi_filter(deltas)).update(
+        stok=Case(
+            *[When(produk_id=kode_barang, lokasi_id=kode_lokasi, then=F('stok') + Value(delta, output_field=STOK_FIELD))
+              for (kode_barang, kode_lokasi), delta in deltas.items()],
+            default=F('stok'),
+            output_field=STOK_FIELD,
+        ),
+    )
+
+
+def transfer_stock(produk, lokasi, jumlah):
+    """
+    Moves `jumlah` from the central Produk.stok to `lokasi` (or back, when
+    negative), writing a 'transfer' ledger row on each side. Must run inside a
+    transaction. Raises ValueError when the giving side has too little stock.
+    Returns the location's StokLokasi row.
+    """
+    jumlah = as_decimal(jumlah)
+    produk = lock_produk([produk.pk])[produk.pk]
+    StokLokasi.objects.get_or_create(produk=produk, lokasi=lokasi)
+    row = lock_stok_lokasi([(produk.pk, lokasi.pk)])[(produk.pk, lokasi.pk)]
+
+    if as_decimal(produk.stok) < jumlah:
+        raise ValueError(f"Stok pusat {produk.nama_barang} tidak cukup. Tersedia: {produk.stok}")
+    if as_decimal(row.stok) < -jumlah:
+        raise ValueError(f"Stok {produk.nama_barang} di {lokasi.nama_lokasi} tidak cukup. Tersedia: {row.stok}")
+
+    apply_stock_deltas({produk.pk: -jumlah})
+    apply_lokasi_deltas({(produk.pk, lokasi.pk): jumlah})
+    StokMutasi.objects.bulk_create([
+        StokMutasi(produk=produk, perubahan=-jumlah, alasan='transfer'),
+        StokMutasi(produk=produk, perubahan=jumlah, alasan='transfer', lokasi=lokasi),
+    ])
+    row.refresh_from_db()
+    return row
+
+
+def stock_as_of(when, kode_barang_list=None):
+    """
+    Returns a Produk queryset annotated with `stok_as_of`, the central stock
+    (Produk.stok) each product had at `when`. For every product the nearest snapshot at or
+    before `when` is taken and only the movements after it are summed, all in
+    one query that walks the (produk, waktu) indexes. Products the ledger
+    knows nothing about at `when` are left out.
+    """
+    snapshots = StokSnapshot.objects.filter(produk=OuterRef('pk'), waktu__lte=when).order_by('-waktu')
+    queryset = Produk.objects.all()
+    if kode_barang_list is not None:
+        queryset = queryset.filter(kode_barang__in=kode_barang_list)
+
+    queryset = queryset.annotate(
+        waktu_snapshot=Coalesce(Subquery(snapshots.values('waktu')[:1]), Value(LEDGER_EPOCH)),
+        stok_snapshot=Subquery(snapshots.values('stok')[:1], output_field=STOK_FIELD),
+    )
+
+    movements = StokMutasi.objects.filter(
+        produk=OuterRef('pk'),
+        lokasi__isnull=True,
+        waktu__gt=OuterRef('waktu_snapshot'),
+        waktu__lte=when,
+    )
+    replayed = Subquery(
+        movements.values('produk').annotate(total=Sum('perubahan')).values('total'),
+        output_field=STOK_FIELD,
+    )
+
+    return queryset.filter(
+        Q(stok_snapshot__isnull=False) | Exists(movements)
+    ).annotate(
+        stok_as_of=Coalesce('stok_snapshot', Value(Decimal('0')), output_field=STOK_FIELD)
+        + Coalesce(replayed, Value(Decimal('0')), output_field=STOK_FIELD),
+    )
+
+
+def take_snapshots(when):
+    """
+    Writes a snapshot at `when` for every product that moved since its last
+    snapshot, so later as_of queries replay fewer movements. Returns the
+    number of snapshots written.
+    """
+    moved = stock_as_of(when).filter(
+        Exists(StokMutasi.objects.filter(
+            produk=OuterRef('pk'),
+            lokasi__isnull=True,
+            waktu__gt=OuterRef('waktu_snapshot'),
+            waktu__lte=when,
+        ))
+    )
+    created = StokSnapshot.objects.bulk_create(
+        [
+            StokSnapshot(produk_id=kode_barang, stok=stok, waktu=when)
+            for kode_barang, stok in moved.values_list('kode_barang', 'stok_as_of')
+        ],
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def low_stock(since, window_days, threshold=None, days_of_cover=None):
+    """
+    Returns Produk below `threshold` units and/or with fewer than
+    `days_of_cover` days of stock left at the sales velocity measured since
+    `since` (spread over `window_days`). Each row is annotated with
+    `terjual`, the quantity sold from the central stock in the window.
+
+    Only central sales count: location sales draw on StokLokasi, not on
+    the Produk.stok they would be compared with. They are summed from a
+    range scan of the (lokasi, waktu_transaksi) index (or, once ANALYZE
+    has run, a skip-scan of (produk, waktu_transaksi) over the window),
+    and the threshold test is a range scan on the stok index, so the cost
+    follows the sales in the window rather than the whole sales history.
+    """
+    sold = Transaksi.objects.filter(waktu_transaksi__range=(since, timezone.now()), lokasi__isnull=True).values('produk').annotate(terjual=Sum('jumlah'))
+
+    condition = Q()
+    if threshold is not None:
+        condition |= Q(stok__lt=threshold)
+    if days_of_cover is not None:
+        # stok / (terjual / window) < days, without dividing by zero
+        short = sold.annotate(
+            kekurangan=F('terjual') * as_decimal(days_of_cover) - F('produk__stok') * window_days,
+        ).filter(kekurangan__gt=0)
+        condition |= Q(kode_barang__in=short.values('produk'))
+
+    terjual = Subquery(sold.filter(produk=OuterRef('pk')).values('terjual'), output_field=STOK_FIELD)
+    return Produk.objects.filter(condition).annotate(
+        terjual=Coalesce(terjual, Value(Decimal('0')), output_field=STOK_FIELD),
+    )
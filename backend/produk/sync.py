@@ -0,0 +1,72 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Produk, ProdukTombstone
+
+
+def encode_watermark(moment, kode_barang):
+    return f"{moment.isoformat()}|{kode_barang}"
+
+
+def decode_watermark(value):
+    """
+    Returns (datetime, kode_barang) from a watermark produced by
+    encode_watermark, or raises ValueError.
+    """
+    moment_str, separator, kode_barang = value.partition('|')
+    moment = parse_datetime(moment_str)
+    if moment is None or not separator:
+        raise ValueError(f"Invalid watermark: {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, kode_barang
+
+
+def _after(queryset, field, watermark):
+    if watermark is None:
+        return queryset
+    moment, kode_barang = watermark
+    return queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'kode_barang__gt': kode_barang}))
+
+
+def changes_since(watermark, limit):
+    """
+    Returns (changed_produk, deleted_kode_barang, new_watermark, has_more)
+    for everything touched after `watermark`, oldest first.
+
+    Both produk and tombstones are read with a keyset on
+    (timestamp, kode_barang) through their indexes. Rows younger than
+    PRODUK_SYNC_LAG_SECONDS are held back: a transaction that is still
+    committing may carry an older timestamp, and handing out a watermark
+    past it would make clients skip that row forever.
+    """
+    upper = timezone.now() - datetime.timedelta(seconds=settings.PRODUK_SYNC_LAG_SECONDS)
+
+    changed = _after(Produk.objects.filter(updated_at__lte=upper), 'updated_at', watermark)
+    deleted = _after(ProdukTombstone.objects.filter(deleted_at__lte=upper), 'deleted_at', watermark)
+
+    merged = sorted(
+        [(produk.updated_at, produk.kode_barang, produk) for produk in changed.order_by('updated_at', 'kode_barang')[:limit + 1]]
+        + [(tombstone.deleted_at, tombstone.kode_barang, None) for tombstone in deleted.order_by('deleted_at', 'kode_barang')[:limit + 1]],
+        key=lambda entry: (entry[0], entry[1]),
+    )
+    has_more = len(merged) > limit
+    page = merged[:limit]
+
+    if page:
+        new_watermark = encode_watermark(page[-1][0], page[-1][1])
+    elif watermark is not None:
+        new_watermark = encode_watermark(*watermark)
+    else:
+        new_watermark = None
+
+    return (
+        [produk for _, _, produk in page if produk is not None],
+        [kode_barang for _, kode_barang, produk in page if produk is None],
+        new_watermark,
+        has_more,
+    )
@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProdukViewSet, TransaksiViewSet, SalesReportView # Added SalesReportView
+from .views import ProdukViewSet, TransaksiViewSet, LokasiViewSet, SalesReportView, BatchView # Added SalesReportView
 
 router = DefaultRouter()
 router.register('produk', ProdukViewSet, basename='produk')
 router.register('transaksi', TransaksiViewSet, basename='transaksi')
+router.register('lokasi', LokasiViewSet, basename='lokasi')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('report/', SalesReportView.as_view(), name='sales-report'), # <-- Added report URL
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
\ No newline at end of file
@@ -0,0 +1,81 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Optimistic concurrency untuk Produk. Setiap penulisan menaikkan
+# Produk.version, dan update dari klien hanya berlaku jika baris di database
+# masih berada di versi yang dilihat klien (UPDATE ... WHERE version = ?),
+# tanpa row lock yang ditahan selama request. Versi dikirim ke klien sebagai
+# ETag dan kembali lewat If-Match (update tunggal) atau field `version`
+# (update tunggal maupun bulk).
+
+
+class VersionConflict(APIException):
+    """The produk changed since the version the client (or this request) read."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Produk sudah diubah oleh request lain. Muat ulang lalu coba lagi."
+    default_code = 'version_conflict'
+
+    def __init__(self, current_version=None):
+        super().__init__()
+        self.current_version = current_version
+        # Set after __init__ so the version stays a number in the response.
+        self.detail = {'detail': self.detail, 'version': current_version}
+
+
+class PreconditionFailed(VersionConflict):
+    """An If-Match header named a version the produk no longer has."""
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "If-Match tidak cocok dengan versi produk saat ini."
+    default_code = 'precondition_failed'
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def parse_if_match(header):
+    """
+    Returns the set of versions an If-Match header accepts, or None when
+    the header is absent or '*' (no condition). Weak tags never match, as
+    If-Match uses strong comparison.
+    """
+    if header is None or header.strip() == '*':
+        return None
+    versions = set()
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.add(int(tag[1:-1]))
+    return versions
+
+
+class ConditionalProdukUpdateMixin:
+    """
+    For views that update a single Produk through ProdukSerializer: sends
+    the version as ETag on retrieve and update, and turns If-Match into the
+    expected version of the conditional update (412 when it does not hold).
+    Without If-Match the update is checked against a `version` in the body,
+    or else against the version read at the start of this request (409).
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag(response.data['version'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response['ETag'] = etag(response.data['version'])
+        return response
+
+    def perform_update(self, serializer):
+        accepted = parse_if_match(self.request.headers.get('If-Match'))
+        if accepted is None:
+            serializer.save()
+            return
+        if serializer.instance.version not in accepted:
+            raise PreconditionFailed(serializer.instance.version)
+        try:
+            serializer.save()
+        except VersionConflict as e:
+            raise PreconditionFailed(e.current_version)
@@ -1,30 +1,82 @@
 import datetime
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal
 from rest_framework import viewsets, filters, generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework import serializers
+from django.conf import settings
+from django.test.client import RequestFactory
+from django.urls import Resolver404, resolve
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, Sum, F, ExpressionWrapper, DecimalField
 from django.db.models.functions import TruncDay
 
-from .models import Produk, Transaksi
-from .serializers import ProdukSerializer, TransaksiSerializer
+from backend import metrics
+from backend.sqlite import write_atomic
+from user.models import User
+from .catalog import get_produk_map
+from .group_commit import GroupCommitTimeout, checkout_committer
+from .models import Lokasi, Produk, StokLokasi, Transaksi, StokMutasi
+from .sequences import transaksi_ids
+from .signals import stock_lock_acquired
+from .stock import (
+    apply_lokasi_deltas, apply_stock_deltas, as_decimal, lock_produk, lock_stok_lokasi, low_stock,
+    record_movement, stock_as_of, transfer_stock,
+)
+from .sync import changes_since, decode_watermark
+from .versioning import ConditionalProdukUpdateMixin, VersionConflict
+from .serializers import ProdukSerializer, TransaksiSerializer, QuoteItemSerializer, QuoteLineSerializer, StokAsOfSerializer, LowStockSerializer, BatchSerializer, LokasiSerializer, StokLokasiSerializer, TransferStokSerializer
+
+class LowStockPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
 
 # === VIEWSET UNTUK CRUD + SEARCH PRODUK ===
-class ProdukViewSet(viewsets.ModelViewSet):
+class ProdukViewSet(ConditionalProdukUpdateMixin, viewsets.ModelViewSet):
     queryset = Produk.objects.all()
     serializer_class = ProdukSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['kode_barang', 'nama_barang']
+    throttle_scopes = {
+        'bulk_update': 'bulk',
+        'bulk_delete': 'bulk',
+        'as_of': 'report',
+        'low_stock': 'report',
+    }
 
     def get_serializer(self, *args, **kwargs):
         if self.action == 'create' and isinstance(self.request.data, list):
             kwargs['many'] = True
         return super().get_serializer(*args, **kwargs)
 
+    def get_object(self):
+        # Plain reads come from the shared catalog when it is on; updates
+        # and deletes always load the row from the database.
+        if self.action == 'retrieve' and settings.PRODUK_SHARED_CATALOG:
+            kode_barang = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            produk = get_produk_map([kode_barang]).get(kode_barang)
+            if produk is not None:
+                self.check_object_permissions(self.request, produk)
+                return produk
+        return super().get_object()
+
     @action(detail=False, methods=['patch'])
     def bulk_update(self, request):
+        """
+        Updates many produk, each as its own conditional update (see
+        produk.versioning): an item may carry the `version` it was edited
+        from, and is reported in `errors` with status 409 and the current
+        version if the produk has changed since. Items commit independently,
+        so no row stays locked for the rest of the request.
+        """
         data = request.data
         if not isinstance(data, list):
             return Response(
@@ -35,29 +87,30 @@ class ProdukViewSet(viewsets.ModelViewSet):
         updated_count = 0
         errors = []
 
-        with transaction.atomic():
-            for item in data:
-                item_kode_barang = item.get('kode_barang')
-                if not item_kode_barang:
-                    errors.append({"error": "Each item must have a 'kode_barang' for bulk update.", "item": item})
-                    continue
+        for item in data:
+            item_kode_barang = item.get('kode_barang')
+            if not item_kode_barang:
+                errors.append({"error": "Each item must have a 'kode_barang' for bulk update.", "item": item})
+                continue
 
-                try:
-                    produk = Produk.objects.get(kode_barang=item_kode_barang)
-                    
-                    update_data = item.copy()
-                    update_data.pop('kode_barang', None) 
-
-                    serializer = self.get_serializer(produk, data=update_data, partial=True)
-                    serializer.is_valid(raise_exception=True)
-                    serializer.save()
-                    updated_count += 1
-                except Produk.DoesNotExist:
-                    errors.append({"error": f"Produk with kode_barang '{item_kode_barang}' not found.", "item": item})
-                except serializers.ValidationError as e:
-                    errors.append({"error": e.detail, "item": item})
-                except Exception as e:
-                    errors.append({"error": str(e), "item": item})
+            try:
+                produk = Produk.objects.get(kode_barang=item_kode_barang)
+
+                update_data = item.copy()
+                update_data.pop('kode_barang', None)
+
+                serializer = self.get_serializer(produk, data=update_data, partial=True)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                updated_count += 1
+            except Produk.DoesNotExist:
+                errors.append({"error": f"Produk with kode_barang '{item_kode_barang}' not found.", "item": item})
+            except VersionConflict as e:
+                errors.append({"error": e.detail['detail'], "status": e.status_code, "version": e.current_version, "item": item})
+            except serializers.ValidationError as e:
+                errors.append({"error": e.detail, "item": item})
+            except Exception as e:
+                errors.append({"error": str(e), "item": item})
 
         if errors:
             return Response(
@@ -85,7 +138,7 @@ class ProdukViewSet(viewsets.ModelViewSet):
             )
 
         deleted_count = 0
-        with transaction.atomic():
+        with write_atomic():
             queryset_to_delete = Produk.objects.filter(kode_barang__in=kode_barang_list)
             deleted_count, _ = queryset_to_delete.delete()
 
@@ -94,11 +147,189 @@ class ProdukViewSet(viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
-class ProdukRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+    @action(detail=False, methods=['post'])
+    def quote(self, request):
+        """
+        Prices a whole cart in one go. Expects a list of
+        {"kode_barang": ..., "jumlah": ...} and resolves every product with a
+        single query (or from the catalog cache when ?cache=true, and from
+        the shared catalog when PRODUK_SHARED_CATALOG is on). stok_cukup
+        compares the cart's total jumlah of each product with its stock, so
+        two lines for the same product cannot each pass on their own.
+        """
+        if not isinstance(request.data, list):
+            return Response(
+                {"detail": "Expected a list of items to quote."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        item_serializer = QuoteItemSerializer(data=request.data, many=True)
+        item_serializer.is_valid(raise_exception=True)
+        items = item_serializer.validated_data
+
+        use_cache = request.query_params.get('cache', '').lower() in ('1', 'true', 'yes')
+        produk_map = get_produk_map([item['kode_barang'] for item in items], use_cache=use_cache)
+        jumlah_per_produk = defaultdict(Decimal)
+        for item in items:
+            jumlah_per_produk[item['kode_barang']] += item['jumlah']
+
+        lines = []
+        grand_total = Decimal('0.00')
+        all_available = True
+        for item in items:
+            kode_barang = item['kode_barang']
+            jumlah = item['jumlah']
+            produk = produk_map.get(kode_barang)
+
+            if produk is None:
+                all_available = False
+                lines.append({
+                    "kode_barang": kode_barang,
+                    "jumlah": jumlah,
+                    "error": f"Produk with kode_barang '{kode_barang}' not found.",
+                })
+                continue
+
+            # Same derivation as TransaksiViewSet.perform_create.
+            total_harga = produk.harga_satuan * jumlah
+            stok_cukup = Decimal(produk.stok) >= jumlah_per_produk[kode_barang]
+            if not stok_cukup:
+                all_available = False
+            grand_total += total_harga
+
+            lines.append({
+                "kode_barang": kode_barang,
+                "nama_barang": produk.nama_barang,
+                "satuan": produk.satuan,
+                "jumlah": jumlah,
+                "harga_satuan": produk.harga_satuan,
+                "total_harga": total_harga,
+                "stok": produk.stok,
+                "stok_cukup": stok_cukup,
+            })
+
+        return Response({
+            "items": QuoteLineSerializer(lines, many=True).data,
+            "total_harga": serializers.DecimalField(max_digits=15, decimal_places=2).to_representation(grand_total),
+            "semua_tersedia": all_available,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='as-of')
+    def as_of(self, request):
+        """
+        Stock per product at ?waktu=<ISO datetime>, rebuilt from the nearest
+        snapshot plus the ledger movements after it. ?kode_barang=A,B limits
+        the products returned.
+        """
+        waktu_str = request.query_params.get('waktu')
+        if not waktu_str:
+            return Response({"error": "Parameter 'waktu' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        waktu = parse_datetime(waktu_str)
+        if waktu is None:
+            return Response({"error": "Invalid 'waktu' format."}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(waktu):
+            waktu = timezone.make_aware(waktu)
+
+        kode_barang = request.query_params.get('kode_barang')
+        kode_barang_list = [kode for kode in kode_barang.split(',') if kode] if kode_barang else None
+
+        queryset = stock_as_of(waktu, kode_barang_list).order_by('kode_barang')
+        return Response({
+            "waktu": waktu,
+            "produk": StokAsOfSerializer(queryset, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync for offline clients. ?since=<watermark> returns produk
+        changed and kode_barang deleted after the watermark, oldest first, at
+        most ?limit rows. Pass the returned watermark on the next call and
+        keep going while has_more is true. Omit since for a full download.
+        """
+        try:
+            since = request.query_params.get('since')
+            watermark = decode_watermark(since) if since else None
+            limit = int(request.query_params.get('limit', settings.PRODUK_SYNC_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "Invalid since or limit."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.PRODUK_SYNC_MAX_PAGE_SIZE))
+
+        changed, deleted, new_watermark, has_more = changes_since(watermark, limit)
+        return Response({
+            "produk": ProdukSerializer(changed, many=True).data,
+            "deleted": deleted,
+            "watermark": new_watermark,
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='low-stock')
+    def low_stock(self, request):
+        """
+        Products that need reordering. ?threshold=N flags stok below N,
+        ?days=D flags less than D days of cover at the average daily sales
+        of the last ?window=W days. With neither, LOW_STOCK_THRESHOLD is used.
+        ?target=T sets the days of cover the reorder suggestion aims for.
+        """
+        try:
+            threshold = request.query_params.get('threshold')
+            threshold = int(threshold) if threshold is not None else None
+            days = request.query_params.get('days')
+            days = int(days) if days is not None else None
+            window_days = int(request.query_params.get('window', settings.LOW_STOCK_WINDOW_DAYS))
+            target_days = int(request.query_params.get('target', days or window_days))
+        except ValueError:
+            return Response({"error": "threshold, days, window and target must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if window_days < 1 or target_days < 0 or (days is not None and days < 0):
+            return Response({"error": "Invalid window, days or target."}, status=status.HTTP_400_BAD_REQUEST)
+        if threshold is None and days is None:
+            threshold = settings.LOW_STOCK_THRESHOLD
+
+        since = timezone.now() - datetime.timedelta(days=window_days)
+        queryset = low_stock(since, window_days, threshold=threshold, days_of_cover=days).order_by('stok', 'kode_barang')
+
+        paginator = LowStockPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = LowStockSerializer(page, many=True, context={'window_days': window_days, 'target_days': target_days})
+        return paginator.get_paginated_response(serializer.data)
+
+class ProdukRetrieveUpdateDestroyAPIView(ConditionalProdukUpdateMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Produk.objects.all()
     serializer_class = ProdukSerializer
     lookup_field = 'kode_barang'
 
+class LokasiViewSet(viewsets.ModelViewSet):
+    """
+    Stores and branches. Stock reaches a location through `transfer`, which
+    moves it out of the central Produk.stok; checkouts that name the location
+    then draw on that location's own stock row.
+    """
+    queryset = Lokasi.objects.all().order_by('kode_lokasi')
+    serializer_class = LokasiSerializer
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['kode_lokasi', 'nama_lokasi']
+
+    @action(detail=True, methods=['get'])
+    def stok(self, request, pk=None):
+        lokasi = self.get_object()
+        rows = StokLokasi.objects.filter(lokasi=lokasi).select_related('produk', 'lokasi').order_by('produk_id')
+        return Response(StokLokasiSerializer(rows, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def transfer(self, request, pk=None):
+        lokasi = self.get_object()
+        serializer = TransferStokSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with write_atomic():
+                row = transfer_stock(serializer.validated_data['produk'], lokasi, serializer.validated_data['jumlah'])
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        row.lokasi = lokasi
+        return Response(StokLokasiSerializer(row).data, status=status.HTTP_200_OK)
+
 class TransaksiViewSet(viewsets.ModelViewSet):
     queryset = Transaksi.objects.all().order_by('-waktu_transaksi')
     serializer_class = TransaksiSerializer
@@ -111,44 +342,90 @@ class TransaksiViewSet(viewsets.ModelViewSet):
         return super().get_serializer(*args, **kwargs)
 
 class TransaksiViewSet(viewsets.ModelViewSet):
-    queryset = Transaksi.objects.all().order_by('-waktu_transaksi')
+    queryset = Transaksi.objects.select_related('produk', 'customer', 'lokasi').order_by('-waktu_transaksi')
     serializer_class = TransaksiSerializer
     filter_backends = [filters.SearchFilter]
-    search_fields = ['id_transaksi', 'produk__nama_barang', 'customer']
+    search_fields = ['id_transaksi', 'produk__nama_barang', 'customer__name']
+    throttle_scopes = {
+        'create': 'checkout',
+        'list': 'report',  # Unpaginated: every transaksi in one response
+        'bulk_update': 'bulk',
+        'bulk_delete': 'bulk',
+    }
 
     def get_serializer(self, *args, **kwargs):
         if self.action == 'create' and isinstance(self.request.data, list):
             kwargs['many'] = True
         return super().get_serializer(*args, **kwargs)
 
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except Exception as e:
+            if settings.METRICS_ENABLED:
+                metrics.checkout_failures.inc(reason=metrics.checkout_failure_reason(e))
+            raise
+
+    def _take_stock(self, produk, jumlah, lokasi=None):
+        """
+        Locks the stock row the sale draws on, checks it and decrements it:
+        the (produk, lokasi) StokLokasi row for a location sale, otherwise the
+        Produk row itself. Checkouts at different locations therefore never
+        wait on each other. Must run inside the checkout's transaction. The
+        time spent locking and writing the row is reported through the
+        stock_lock_acquired signal.
+        """
+        started = time.perf_counter()
+        if lokasi is not None:
+            row = lock_stok_lokasi([(produk.pk, lokasi.pk)]).get((produk.pk, lokasi.pk))
+            if row is None:
+                raise serializers.ValidationError(f"{produk.nama_barang} tidak tersedia di {lokasi.nama_lokasi}.", code='out_of_stock')
+            if as_decimal(row.stok) < jumlah:
+                raise serializers.ValidationError(f"Stok tidak cukup untuk {produk.nama_barang} di {lokasi.nama_lokasi}. Tersedia: {row.stok}", code='out_of_stock')
+            StokLokasi.objects.filter(pk=row.pk).update(stok=F('stok') - jumlah)
+            stock_lock_acquired.send(sender=self.__class__, produk=produk.pk, lokasi=lokasi.pk, wait=time.perf_counter() - started)
+            return row
+
+        produk_locked = Produk.objects.select_for_update().get(pk=produk.pk)
+
+        if as_decimal(produk_locked.stok) < jumlah:
+            raise serializers.ValidationError(f"Stok tidak cukup untuk {produk_locked.nama_barang}. Tersedia: {produk_locked.stok}", code='out_of_stock')
+
+        produk_locked.stok = F('stok') - jumlah
+        produk_locked.version = F('version') + 1
+        produk_locked.save(update_fields=['stok', 'updated_at', 'version'])
+        stock_lock_acquired.send(sender=self.__class__, produk=produk_locked.pk, lokasi=None, wait=time.perf_counter() - started)
+        return produk_locked
+
     def perform_create(self, serializer):
         if getattr(serializer, 'many', False):
             # For bulk transaction requests (a list of items)
             instances = []
-            with transaction.atomic():
-                for item_data in serializer.validated_data:
+            movements = []
+            # Reserve every id before taking the write lock (see produk.sequences).
+            id_transaksi_list = transaksi_ids.allocate(len(serializer.validated_data))
+            with write_atomic():
+                for item_data, id_transaksi in zip(serializer.validated_data, id_transaksi_list):
                     produk = item_data['produk']
-                    customer_name = item_data['customer']
+                    customer = item_data['customer']
                     jumlah = item_data['jumlah']
+                    lokasi = item_data.get('lokasi')
                     total_harga = produk.harga_satuan * jumlah
 
                     try:
-                        produk_locked = Produk.objects.select_for_update().get(pk=produk.pk)
-                        
-                        if float(produk_locked.stok) < float(jumlah):
-                            raise serializers.ValidationError(f"Stok tidak cukup untuk {produk_locked.nama_barang}. Tersedia: {produk_locked.stok}")
-                        
-                        produk_locked.stok = F('stok') - jumlah
-                        produk_locked.save()
-                        
+                        self._take_stock(produk, jumlah, lokasi)
+
                         instance = Transaksi.objects.create(
+                            id_transaksi=id_transaksi,
                             produk=produk,
-                            customer=customer_name,
+                            customer=customer,
+                            lokasi=lokasi,
                             jumlah=jumlah,
                             waktu_transaksi=item_data.get('waktu_transaksi', timezone.now()),
                             total_harga=total_harga
                         )
                         instances.append(instance)
+                        movements.append(StokMutasi(produk=produk, perubahan=-jumlah, alasan='penjualan', transaksi=instance, lokasi=lokasi))
 
                     except Produk.DoesNotExist:
                         raise serializers.ValidationError(f"Produk dengan ID {produk.pk} tidak ditemukan.")
@@ -156,26 +433,35 @@ class TransaksiViewSet(viewsets.ModelViewSet):
                         raise
                     except Exception as e:
                         raise serializers.ValidationError(f"Terjadi kesalahan saat memproses transaksi: {str(e)}")
+                StokMutasi.objects.bulk_create(movements)
+            # Let the response show the server-assigned id_transaksi values.
+            serializer.instance = instances
         # For a single transaction request
         else:
             validated_data = serializer.validated_data
             produk = validated_data['produk']
             jumlah = validated_data['jumlah']
+            lokasi = validated_data.get('lokasi')
             total_harga = produk.harga_satuan * jumlah
+            id_transaksi = transaksi_ids.next()
+
+            def checkout():
+                self._take_stock(produk, jumlah, lokasi)
+
+                instance = serializer.save(id_transaksi=id_transaksi, total_harga=total_harga)
+                record_movement(produk, -jumlah, 'penjualan', transaksi=instance, lokasi=lokasi)
 
             try:
-                with transaction.atomic():
-                    produk_locked = Produk.objects.select_for_update().get(pk=produk.pk)
-                    
-                    if float(produk_locked.stok) < float(jumlah):
-                        raise serializers.ValidationError(f"Stok tidak cukup untuk {produk_locked.nama_barang}. Tersedia: {produk_locked.stok}")
-                    
-                    produk_locked.stok = F('stok') - jumlah
-                    produk_locked.save()
-                    
-                    serializer.save(total_harga=total_harga)
-                    
-            except serializers.ValidationError as e:
+                # Inside a caller's transaction (an atomic batch) the checkout must
+                # join it, not commit apart on the group-commit thread.
+                if settings.CHECKOUT_GROUP_COMMIT and not transaction.get_connection().in_atomic_block:
+                    # Shares one transaction with concurrent checkouts (see produk.group_commit).
+                    checkout_committer.submit(checkout, key=(produk.pk, lokasi.pk if lokasi else ''))
+                else:
+                    with write_atomic():
+                        checkout()
+
+            except (serializers.ValidationError, GroupCommitTimeout) as e:
                 raise e
             except Exception as e:
                 raise serializers.ValidationError(str(e))
@@ -193,6 +479,16 @@ class TransaksiViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['patch'])
     def bulk_update(self, request):
+        """
+        Updates many transaksi at once and keeps stock and total_harga in step.
+        The transaksi are loaded in one query and every product they move from
+        or to in another, locked in key order (plus their StokLokasi rows for
+        location sales). Each stock row then changes by the old jumlah minus
+        the new jumlah of its items, applied in one UPDATE per table together
+        with bulk_update and the ledger rows. Items that fail validation or
+        would take stock below zero are reported in `errors` and left
+        unchanged.
+        """
         data = request.data
         if not isinstance(data, list):
             return Response(
@@ -200,32 +496,123 @@ class TransaksiViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        updated_count = 0
         errors = []
-
-        with transaction.atomic():
-            for item in data:
-                item_id_transaksi = item.get('id_transaksi')
-                if not item_id_transaksi:
-                    errors.append({"error": "Each item must have an 'id_transaksi' for bulk update.", "item": item})
+        items = []
+        seen = set()
+        for item in data:
+            item_id_transaksi = item.get('id_transaksi') if isinstance(item, dict) else None
+            if not item_id_transaksi:
+                errors.append({"error": "Each item must have an 'id_transaksi' for bulk update.", "item": item})
+                continue
+            try:
+                item_id_transaksi = int(item_id_transaksi)
+            except (TypeError, ValueError):
+                errors.append({"error": f"Invalid id_transaksi {item_id_transaksi!r}.", "item": item})
+                continue
+            if item_id_transaksi in seen:
+                errors.append({"error": f"id_transaksi {item_id_transaksi} appears more than once.", "item": item})
+                continue
+            seen.add(item_id_transaksi)
+            items.append((item_id_transaksi, item))
+
+        fields = self.get_serializer().fields
+        with write_atomic():
+            transaksi_map = Transaksi.objects.in_bulk([id_transaksi for id_transaksi, _ in items])
+            produk_map = lock_produk(
+                {transaksi.produk_id for transaksi in transaksi_map.values()}
+                | {item['produk'] for _, item in items if isinstance(item.get('produk'), str)}
+            )
+            customer_names = {item['customer'] for _, item in items if isinstance(item.get('customer'), str)}
+            customer_map = User.objects.in_bulk(customer_names, field_name='name') if customer_names else {}
+
+            pending = []
+            for id_transaksi, item in items:
+                transaksi = transaksi_map.get(id_transaksi)
+                if transaksi is None:
+                    errors.append({"error": f"Transaksi with id_transaksi {id_transaksi} not found.", "item": item})
                     continue
-
                 try:
-                    transaksi = Transaksi.objects.get(pk=item_id_transaksi)
-                    
-                    update_data = item.copy()
-                    update_data.pop('id_transaksi', None)
-
-                    serializer = self.get_serializer(transaksi, data=update_data, partial=True)
-                    serializer.is_valid(raise_exception=True)
-                    serializer.save()
-                    updated_count += 1
-                except Transaksi.DoesNotExist:
-                    errors.append({"error": f"Transaksi with id_transaksi {item_id_transaksi} not found.", "item": item})
+                    values = self._bulk_update_values(item, fields, produk_map, customer_map)
                 except serializers.ValidationError as e:
                     errors.append({"error": e.detail, "item": item})
-                except Exception as e:
-                    errors.append({"error": str(e), "item": item})
+                    continue
+                pending.append((transaksi, values, item))
+
+            # Sales made at a location move that location's stock row instead
+            # of the central Produk.stok. Rows are locked after the products,
+            # in the same order transfer_stock uses.
+            lokasi_rows = lock_stok_lokasi({
+                (kode_barang, transaksi.lokasi_id)
+                for transaksi, values, _ in pending if transaksi.lokasi_id is not None
+                for kode_barang in (transaksi.produk_id, values.get('produk', produk_map[transaksi.produk_id]).pk)
+            })
+
+            def available(key):
+                kode_barang, kode_lokasi = key
+                if kode_lokasi is None:
+                    return as_decimal(produk_map[kode_barang].stok)
+                row = lokasi_rows.get(key)
+                return as_decimal(row.stok) if row is not None else Decimal('0')
+
+            # Drop the item taking the most from each stock row that would go
+            # below zero and recount: dropping one can also take back stock it
+            # was returning to another row.
+            while True:
+                deltas = defaultdict(Decimal)
+                taken = []
+                for transaksi, values, _ in pending:
+                    produk = values.get('produk', produk_map[transaksi.produk_id])
+                    old_key = (transaksi.produk_id, transaksi.lokasi_id)
+                    new_key = (produk.pk, transaksi.lokasi_id)
+                    old_jumlah = as_decimal(transaksi.jumlah or 0)
+                    new_jumlah = as_decimal(values.get('jumlah', transaksi.jumlah) or 0)
+                    deltas[old_key] += old_jumlah
+                    deltas[new_key] -= new_jumlah
+                    taken.append((new_key, produk, new_jumlah - (old_jumlah if new_key == old_key else 0)))
+                short = {key for key, delta in deltas.items() if available(key) + delta < 0}
+                if not short:
+                    break
+                dropped = {
+                    max((i for i, (key, _, _) in enumerate(taken) if key == short_key), key=lambda i: taken[i][2])
+                    for short_key in short
+                }
+                for i in sorted(dropped):
+                    key, produk, _ = taken[i]
+                    lokasi_label = f" di {key[1]}" if key[1] is not None else ""
+                    errors.append({
+                        "error": f"Stok tidak cukup untuk {produk.nama_barang}{lokasi_label}. Tersedia: {available(key)}",
+                        "item": pending[i][2],
+                    })
+                pending = [entry for i, entry in enumerate(pending) if i not in dropped]
+
+            movements = []
+            for transaksi, values, _ in pending:
+                old_produk = produk_map[transaksi.produk_id]
+                old_jumlah = as_decimal(transaksi.jumlah or 0)
+                for name, value in values.items():
+                    setattr(transaksi, name, value)
+                new_jumlah = as_decimal(transaksi.jumlah or 0)
+                new_produk = produk_map[transaksi.produk_id]
+
+                if new_produk.pk != old_produk.pk or new_jumlah != old_jumlah:
+                    transaksi.total_harga = new_produk.harga_satuan * new_jumlah
+                    ledger = {'alasan': 'penjualan', 'transaksi': transaksi, 'lokasi_id': transaksi.lokasi_id}
+                    if new_produk.pk == old_produk.pk:
+                        movements.append(StokMutasi(produk=new_produk, perubahan=old_jumlah - new_jumlah, **ledger))
+                    else:
+                        if old_jumlah:
+                            movements.append(StokMutasi(produk=old_produk, perubahan=old_jumlah, **ledger))
+                        if new_jumlah:
+                            movements.append(StokMutasi(produk=new_produk, perubahan=-new_jumlah, **ledger))
+
+            apply_stock_deltas({kode_barang: delta for (kode_barang, kode_lokasi), delta in deltas.items() if kode_lokasi is None})
+            apply_lokasi_deltas({key: delta for key, delta in deltas.items() if key[1] is not None})
+            Transaksi.objects.bulk_update(
+                [transaksi for transaksi, _, _ in pending],
+                ['produk', 'customer', 'jumlah', 'total_harga', 'waktu_transaksi'],
+            )
+            StokMutasi.objects.bulk_create(movements)
+        updated_count = len(pending)
 
         if errors:
             return Response(
@@ -237,6 +624,36 @@ class TransaksiViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    def _bulk_update_values(self, item, fields, produk_map, customer_map):
+        """
+        Validates one bulk_update item with the serializer's own fields, but
+        resolves 'produk' and 'customer' from the preloaded maps instead of a
+        query per item. Returns the model attributes to set.
+        """
+        values = {}
+        errors = {}
+        for name, lookup in (('produk', produk_map), ('customer', customer_map)):
+            if name not in item:
+                continue
+            value = lookup.get(item[name]) if isinstance(item[name], str) else None
+            if value is None:
+                try:
+                    fields[name].fail('does_not_exist', slug_name=fields[name].slug_field, value=item[name])
+                except serializers.ValidationError as e:
+                    errors[name] = e.detail
+            else:
+                values[name] = value
+        for name in ('jumlah', 'waktu_transaksi'):
+            if name not in item:
+                continue
+            try:
+                values[name] = fields[name].run_validation(item[name])
+            except serializers.ValidationError as e:
+                errors[name] = e.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return values
+
     @action(detail=False, methods=['delete'])
     def bulk_delete(self, request):
         id_transaksi_list = request.data.get('id_transaksi_list', [])
@@ -253,7 +670,7 @@ class TransaksiViewSet(viewsets.ModelViewSet):
             )
 
         deleted_count = 0
-        with transaction.atomic():
+        with write_atomic():
             queryset_to_delete = Transaksi.objects.filter(pk__in=id_transaksi_list)
             deleted_count, _ = queryset_to_delete.delete()
 
@@ -263,11 +680,95 @@ class TransaksiViewSet(viewsets.ModelViewSet):
         )
 
 class TransaksiRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Transaksi.objects.all()
+    queryset = Transaksi.objects.select_related('produk', 'customer', 'lokasi')
     serializer_class = TransaksiSerializer
     lookup_field = 'id_transaksi'
 
+class BatchView(generics.GenericAPIView):
+    """
+    Runs several produk / transaksi / report calls in one round trip.
+
+    Body: {"atomic": false, "requests": [{"method": "GET", "path": "/api/produk/A1/"}, ...]}.
+    Sub-requests go through the normal URL resolver and viewsets in order,
+    reusing the user this request authenticated as. With "atomic": true they
+    share one transaction, which is rolled back (and the batch stopped) as
+    soon as one of them fails.
+    """
+    serializer_class = BatchSerializer
+    allowed_prefixes = ('/api/produk/', '/api/transaksi/', '/api/report/')
+    request_factory = RequestFactory()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+        atomic = serializer.validated_data['atomic']
+
+        for index, sub_request in enumerate(sub_requests):
+            if not sub_request['path'].startswith(self.allowed_prefixes):
+                return Response(
+                    {"error": f"Request {index}: path must start with one of {', '.join(self.allowed_prefixes)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Authenticate once; every sub-request is forced to the same user.
+        user, auth = request.user, request.auth
+
+        if not atomic:
+            responses = [self._dispatch(request, sub_request, user, auth) for sub_request in sub_requests]
+            return Response({"atomic": False, "responses": responses}, status=status.HTTP_200_OK)
+
+        # id_transaksi blocks cannot be reserved once the batch holds the write lock.
+        transaksi_ids.prefetch(self._count_checkout_lines(sub_requests))
+        responses = []
+        # A batch of reads only needs one consistent snapshot, not the write lock.
+        writes = any(sub_request['method'] not in SAFE_METHODS for sub_request in sub_requests)
+        with write_atomic() if writes else transaction.atomic():
+            for sub_request in sub_requests:
+                responses.append(self._dispatch(request, sub_request, user, auth))
+                if responses[-1]['status'] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        committed = len(responses) == len(sub_requests) and responses[-1]['status'] < 400
+
+        return Response({"atomic": True, "committed": committed, "responses": responses}, status=status.HTTP_200_OK)
+
+    def _dispatch(self, request, sub_request, user, auth):
+        path = sub_request['path']
+        try:
+            match = resolve(path.partition('?')[0])
+        except Resolver404:
+            return {"path": path, "status": status.HTTP_404_NOT_FOUND, "body": {"detail": "Not found."}}
+
+        body = sub_request.get('body')
+        # Sub-requests are throttled as the client that sent the batch.
+        client = {key: request.META[key] for key in ('REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR') if key in request.META}
+        wsgi_request = self.request_factory.generic(
+            sub_request['method'],
+            path,
+            data=json.dumps(body) if body is not None else '',
+            content_type='application/json',
+            secure=request.is_secure(),
+            HTTP_HOST=request.get_host(),
+            **client,
+        )
+        wsgi_request._force_auth_user = user
+        wsgi_request._force_auth_token = auth
+
+        response = match.func(wsgi_request, *match.args, **match.kwargs)
+        return {"path": path, "status": response.status_code, "body": getattr(response, 'data', None)}
+
+    def _count_checkout_lines(self, sub_requests):
+        count = 0
+        for sub_request in sub_requests:
+            if sub_request['method'] == 'POST' and sub_request['path'].startswith('/api/transaksi/'):
+                body = sub_request.get('body')
+                count += len(body) if isinstance(body, list) else 1
+        return count
+
 class SalesReportView(generics.GenericAPIView):
+    throttle_scope = 'report'
+
     def get(self, request, *args, **kwargs):
         month_str = request.query_params.get('month', None)
         year_str = request.query_params.get('year', None)
@@ -298,6 +799,10 @@ class SalesReportView(generics.GenericAPIView):
             waktu_transaksi__date__gte=start_of_month,
             waktu_transaksi__date__lte=end_of_month
         )
+        # ?lokasi=<kode_lokasi> membatasi laporan ke satu lokasi
+        lokasi_filter = request.query_params.get('lokasi')
+        if lokasi_filter:
+            transaksi_bulan_ini = transaksi_bulan_ini.filter(lokasi_id=lokasi_filter)
 
         # --- Data Penjualan (Revenue) ---
         penjualan_target_month_data = transaksi_bulan_ini.aggregate(total=Sum('total_harga'))
@@ -327,14 +832,35 @@ class SalesReportView(generics.GenericAPIView):
         # 3. Laporan Tahunan
         start_of_year = datetime.date(target_year, 1, 1)
         end_of_year = datetime.date(target_year, 12, 31)
-        produk_terjual_tahunan_data = Transaksi.objects.filter(
+        transaksi_tahun_ini = Transaksi.objects.filter(
             waktu_transaksi__date__gte=start_of_year,
             waktu_transaksi__date__lte=end_of_year
-        ).aggregate(total=Sum('jumlah'))
+        )
+        if lokasi_filter:
+            transaksi_tahun_ini = transaksi_tahun_ini.filter(lokasi_id=lokasi_filter)
+        produk_terjual_tahunan_data = transaksi_tahun_ini.aggregate(total=Sum('jumlah'))
         produk_terjual_tahunan = produk_terjual_tahunan_data['total'] or 0
+
+        # 4. Laporan per Lokasi (tanpa lokasi = penjualan dari stok pusat)
+        laporan_per_lokasi = [
+            {
+                "kode_lokasi": item['lokasi'],
+                "nama_lokasi": item['lokasi__nama_lokasi'] or "Pusat",
+                "jumlah_transaksi": item['jumlah_transaksi'],
+                "produk_terjual": item['produk_terjual'] or 0,
+                "penjualan_revenue": f"Rp {item['revenue'] or 0:,.0f}".replace(",", "."),
+            }
+            for item in transaksi_bulan_ini.values('lokasi', 'lokasi__nama_lokasi').annotate(
+                jumlah_transaksi=Count('id_transaksi'),
+                produk_terjual=Sum('jumlah'),
+                revenue=Sum('total_harga'),
+            ).order_by('lokasi')
+        ]
         
         # --- Menyusun Laporan ---
-        transaksi_serializer = TransaksiSerializer(transaksi_bulan_ini.order_by('-waktu_transaksi'), many=True)
+        transaksi_serializer = TransaksiSerializer(
+            transaksi_bulan_ini.select_related('produk', 'customer', 'lokasi').order_by('-waktu_transaksi'), many=True
+        )
 
         report_data = {
             "bulan_laporan": target_date.strftime('%Y-%m'),
@@ -345,6 +871,7 @@ class SalesReportView(generics.GenericAPIView):
             "produk_terjual_bulan_ini": produk_terjual_bulanan,
             "produk_terjual_tahun_ini": produk_terjual_tahunan,
             "laporan_produk_terjual_harian": laporan_harian,
+            "laporan_per_lokasi": laporan_per_lokasi,
 
             # Detail transaksi bulan ini
             "detail_transaksi_bulan_ini": transaksi_serializer.data,
@@ -1,6 +1,48 @@
+from django.db.models import Q
 from rest_framework import serializers
+from backend.serializers import BulkListSerializer
+from backend.sqlite import write_atomic
 from .models import User
 
+class UserListSerializer(BulkListSerializer):
+    """
+    Bulk registration: looks up every email and name in the payload in one
+    query, rejects items that clash with the database or with an earlier
+    item, and inserts the users with a single bulk_create.
+    """
+
+    def prefetch(self, data):
+        self.seen = {'email': set(), 'name': set()}
+        existing = User.objects.filter(
+            Q(email__in=self.collect(data, 'email')) | Q(name__in=self.collect(data, 'name'))
+        ).values_list('email', 'name')
+        return {
+            'email': {email for email, _ in existing},
+            'name': {name for _, name in existing},
+        }
+
+    def validate_item(self, attrs):
+        errors = {}
+        for field, message in (('email', 'Email already exists'), ('name', 'Name already exists')):
+            if attrs[field] in self.child.prefetched[field] or attrs[field] in self.seen[field]:
+                errors[field] = [message]
+        if errors:
+            raise serializers.ValidationError(errors)
+        for field in ('email', 'name'):
+            self.seen[field].add(attrs[field])
+        return attrs
+
+    def create(self, validated_data):
+        users = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            password = attrs.pop('password')
+            user_instance = User(**attrs)
+            user_instance.set_password(password) # Hash the password
+            users.append(user_instance)
+        with write_atomic():
+            return User.objects.bulk_create(users)
+
 class UserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
     name = serializers.CharField(required=True)
@@ -12,6 +54,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'name', 'email', 'password', 'full_name', 'is_active']
         read_only_fields = ['is_active', 'date_joined']
+        list_serializer_class = UserListSerializer
 
     def create(self, validated_data):
         if User.objects.filter(email=validated_data['email']).exists():
@@ -37,4 +80,11 @@ class UserSerializer(serializers.ModelSerializer):
 # Serializer for Login
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
-    password = serializers.CharField(required=True, write_only=True, style={'input_type': 'password'})
\ No newline at end of file
+    password = serializers.CharField(required=True, write_only=True, style={'input_type': 'password'})
+
+# Serializer for a customer's lifetime purchase totals
+class TransaksiRingkasanSerializer(serializers.Serializer):
+    jumlah_transaksi = serializers.IntegerField(read_only=True)
+    total_produk = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    total_belanja = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    transaksi_terakhir = serializers.DateTimeField(read_only=True)
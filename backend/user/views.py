@@ -1,10 +1,19 @@
 from rest_framework import viewsets, filters, status, generics
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token # For token generation
+from django.db.models import Count, Max, Sum
+from produk.models import Transaksi
+from produk.serializers import TransaksiSerializer
 from .models import User
-from .serializers import UserSerializer, LoginSerializer
+from .serializers import UserSerializer, LoginSerializer, TransaksiRingkasanSerializer
+
+class TransaksiHistoryPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
 
 class userViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all();
@@ -29,6 +38,34 @@ class userViewSet(viewsets.ModelViewSet):
             kwargs['many'] = True # Set many=True for bulk serialization
         return super().get_serializer(*args, **kwargs)
 
+    @action(detail=True, methods=['get'])
+    def transaksi(self, request, pk=None):
+        """
+        Paginated purchase history of one customer, newest first, plus
+        lifetime totals. Both read through the (customer, waktu_transaksi) index.
+        """
+        user = self.get_object()
+        history = Transaksi.objects.filter(customer=user)
+
+        ringkasan = history.aggregate(
+            jumlah_transaksi=Count('id_transaksi'),
+            total_produk=Sum('jumlah'),
+            total_belanja=Sum('total_harga'),
+            transaksi_terakhir=Max('waktu_transaksi'),
+        )
+
+        paginator = TransaksiHistoryPagination()
+        page = paginator.paginate_queryset(
+            history.select_related('produk', 'customer', 'lokasi').order_by('-waktu_transaksi', '-id_transaksi'),
+            request,
+            view=self,
+        )
+        response = paginator.get_paginated_response(TransaksiSerializer(page, many=True).data)
+        ringkasan['total_produk'] = ringkasan['total_produk'] or 0
+        ringkasan['total_belanja'] = ringkasan['total_belanja'] or 0
+        response.data['ringkasan'] = TransaksiRingkasanSerializer(ringkasan).data
+        return response
+
 
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer